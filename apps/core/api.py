@@ -0,0 +1,107 @@
+""" Versioned JSON API. Responses are revalidated with ETag/Last-Modified, derived from the latest snapshot. """
+import hashlib
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import Max
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.dateparse import parse_datetime
+from django.utils.http import parse_http_date
+from django.views.decorators.http import condition, require_GET
+
+from apps.webcam.models import WebCam
+
+HISTORY_RESOLUTIONS = (None, 'hour', 'day')
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params={'separators': (',', ':')})
+
+
+def cache_until_next_capture(view):
+    """ Fresh until the next capture cycle is expected (from Last-Modified); afterwards, clients revalidate (cheap 304s).
+        Wraps `condition` so that its 304s also refresh the max-age of the copies kept by browsers and CDNs. """
+    @wraps(view)
+    def inner(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            max_age = settings.CAPTURE_INTERVAL_SECONDS
+            if response.has_header('Last-Modified'):
+                age = time.time() - parse_http_date(response['Last-Modified'])
+                max_age = max(60, int(settings.CAPTURE_INTERVAL_SECONDS - age))
+            patch_cache_control(response, public=True, max_age=max_age)
+        return response
+    return inner
+
+
+def etag(request, last_modified):
+    """ Depends on the data version and on the query (e.g. the history range). """
+    version = last_modified.isoformat() if last_modified else 'empty'
+    return hashlib.md5(f'{version}|{request.get_full_path()}'.encode()).hexdigest()
+
+
+def parse_ts(value):
+    ts = parse_datetime(value)
+    if ts is None:
+        raise ValueError(value)
+    return timezone.make_aware(ts) if timezone.is_naive(ts) else ts
+
+
+def latest_ts(request, *args, **kwargs):
+    return WebCam.objects.aggregate(ts=Max('latest_snapshot__ts'))['ts']
+
+
+def webcam_latest_ts(request, slug):
+    return WebCam.objects.filter(slug=slug).values_list('latest_snapshot__ts', flat=True).first()
+
+
+@require_GET
+@cache_until_next_capture
+@condition(etag_func=lambda request: etag(request, latest_ts(request)), last_modified_func=latest_ts)
+def webcams(request):
+    """ Current crowd count of every webcam. """
+    cams = list(WebCam.objects.select_related('latest_snapshot').order_by('id'))
+    return json_response({
+        'webcams': [
+            {
+                'slug': cam.slug,
+                'name': cam.beach_name,
+                'lat': float(cam.beach_latitude) if cam.beach_latitude is not None else None,
+                'lon': float(cam.beach_longitude) if cam.beach_longitude is not None else None,
+                'max': cam.max_crowd_count,
+                'count': round(cam.latest_snapshot.predicted_crowd_count) if cam.latest_snapshot else None,
+                'regions': cam.latest_snapshot.region_counts if cam.latest_snapshot else None,
+                'ts': int(cam.latest_snapshot.ts.timestamp()) if cam.latest_snapshot else None,
+            }
+            for cam in cams
+        ],
+    })
+
+
+@require_GET
+@cache_until_next_capture
+@condition(etag_func=lambda request, slug: etag(request, webcam_latest_ts(request, slug)), last_modified_func=webcam_latest_ts)
+def webcam_history(request, slug):
+    """ History of a webcam as parallel arrays: `t` (epoch seconds) and `c` (crowd count).
+        Query: `since`, `until` (ISO 8601, default: last HISTORY_RAW_DAYS days) and `resolution` ('hour' or 'day'). """
+    cam = get_object_or_404(WebCam.objects.select_related('latest_snapshot'), slug=slug)
+    resolution = request.GET.get('resolution') or None
+    try:
+        since = parse_ts(request.GET['since']) if 'since' in request.GET else timezone.now() - timedelta(days=settings.HISTORY_RAW_DAYS)
+        until = parse_ts(request.GET['until']) if 'until' in request.GET else None
+        if resolution not in HISTORY_RESOLUTIONS:
+            raise ValueError(resolution)
+    except ValueError:
+        return json_response({'errors': "Invalid 'since', 'until' or 'resolution'."}, status=400)
+    history = cam.history(since=since, until=until, resolution=resolution)
+    return json_response({
+        'slug': cam.slug,
+        'resolution': resolution,
+        't': [int(ts.timestamp()) for ts, _ in history],
+        'c': [round(count, 1) for _, count in history],
+    })
@@ -0,0 +1,47 @@
+""" Cache of rendered pages, invalidated exactly when the data changes (no guessed TTL).
+
+Pages are cached under the current "data generation", a counter bumped by download_and_process.py at the end of every
+cycle (and by any other process changing what pages show). A bump makes every cached page unreachable at once.
+The cache backend must be shared by all processes (see CACHES in settings).
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+
+GENERATION_KEY = 'data-generation'
+
+
+def data_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Never reuse a past generation (e.g. if the key was evicted), or stale pages could be served again
+        cache.add(GENERATION_KEY, time.time_ns(), timeout=None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def bump_data_generation():
+    try:
+        return cache.incr(GENERATION_KEY)
+    except ValueError:  # Missing key
+        return data_generation()
+
+
+def cache_per_data_generation(view):
+    """ Caches successful GET/HEAD responses of `view` until the next data generation. """
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+        url_hash = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+        key = f'page:{data_generation()}:{url_hash}'
+        response = cache.get(key)
+        if response is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming and not response.cookies:
+                cache.set(key, response, timeout=settings.PAGE_CACHE_SECONDS)
+        return response
+    return wrapped
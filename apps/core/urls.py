@@ -1,9 +1,13 @@
 from django.urls import path
 
-from apps.core import views
+from apps.core import api, views
 
 urlpatterns = [
     path('', views.home, name='home'),
     path('platja/<str:slug>', views.webcam, name='beach'),
     path('analitza/', views.analyze_image, name='analyze-image'),
+    path('analitza/jobs/<uuid:job_id>/', views.analyze_image_job, name='analyze-image-job'),
+    path('analitza/jobs/<uuid:job_id>/overlay', views.analyze_image_job_overlay, name='analyze-image-job-overlay'),
+    path('api/v1/webcams/', api.webcams, name='api-webcams'),
+    path('api/v1/webcams/<str:slug>/history/', api.webcam_history, name='api-webcam-history'),
 ]
\ No newline at end of file
@@ -1,33 +1,44 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.shortcuts import get_object_or_404, render
-from django.utils.safestring import mark_safe
+from django.utils import timezone
 
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
 
+from apps.prediction import jobs, statistics
+from apps.prediction.models import AnalysisJob
 from apps.webcam.models import WebCam
 from apps.core.forms import ImageUploaderForm
+from apps.core.page_cache import cache_per_data_generation
 
-from predictions.classes.BayesianPredictor import BayesianPredictor
-from predictions.actions.CustomerPredict import CustomerPredict
+from predictions.DTO.PredictionDTO import PredictionDTO
 
 
 # Create your views here.
 
 
+@cache_per_data_generation
 def home(request):
     """ Returns home page. """
-    beachcams = list(WebCam.objects.all())
+    beachcams = list(WebCam.objects.select_related('latest_snapshot'))
     return render(request, 'core/home.html', context={'cams': beachcams})
 
 
+@cache_per_data_generation
 def webcam(request, slug):
     """ Returns ajax_image of latest prediction overimposed on captured image. """
-    beachcam = get_object_or_404(WebCam, slug=slug)
-    other_beachcams = WebCam.objects.exclude(slug=slug)
-    history_dates, history_counts = zip(*[[f"'{h.ts.isoformat()}'", round(h.predicted_crowd_count)] for h in beachcam.history()])
-    history_dates = f'[{",".join([str(a) for a in list(history_dates)])}]'
-    history_counts = f'[{",".join([str(a) for a in list(history_counts)])}]'
-    history = [[h.ts.timestamp() * 1000, h.predicted_crowd_count] for h in beachcam.history()]
-    return render(request, 'core/beach.html', context={'cam': beachcam, 'other_cams': other_beachcams, 'prediction': beachcam.last_prediction, 'history': history, 'history_dates': mark_safe(history_dates), 'history_counts': mark_safe(history_counts)})
+    beachcam = get_object_or_404(WebCam.objects.select_related('latest_snapshot'), slug=slug)
+    other_beachcams = list(WebCam.objects.select_related('latest_snapshot').exclude(slug=slug))
+    # Recent history at full resolution, older one as daily averages: the payload does not grow with the history
+    now = timezone.now()
+    raw_since = now - timedelta(days=settings.HISTORY_RAW_DAYS)
+    history = (beachcam.history(since=now - timedelta(days=settings.HISTORY_DAYS), until=raw_since, resolution='day')
+               + beachcam.history(since=raw_since))
+    history = [[ts.timestamp() * 1000, round(count, 1)] for ts, count in history]
+    return render(request, 'core/beach.html', context={'cam': beachcam, 'other_cams': other_beachcams, 'prediction': beachcam.last_prediction, 'history': history, 'weekly_profile': statistics.weekly_profile(beachcam)})
 
 def analyze_image(request):
     # https://docs.djangoproject.com/en/5.0/topics/forms/
@@ -36,15 +47,40 @@ def analyze_image(request):
         if form.is_valid():
             cleaned_data = form.cleaned_data
             image = cleaned_data.get('image')
-            predictor = BayesianPredictor()
-            action = CustomerPredict()
-            predictionDTO = action.handle(image, predictor)
-            if predictionDTO is None:
-                return JsonResponse({'errors': "Internal Server Error"}, status=500)
-            else:
-                return JsonResponse(predictionDTO.to_dict(), status=200)
+            client = request.META.get('HTTP_X_REAL_IP') or request.META.get('REMOTE_ADDR') or ''
+            # Inference runs in `manage.py run_analysis_worker`, web workers only queue the image
+            try:
+                job = jobs.submit(image, client)
+            except (jobs.QueueFull, jobs.RateLimited) as e:
+                response = JsonResponse({'errors': "Too many images are being analyzed, try again later."}, status=429)
+                response['Retry-After'] = settings.ANALYSIS_RATE_LIMIT[1] if isinstance(e, jobs.RateLimited) else 10
+                return response
+            poll_url = reverse('analyze-image-job', args=[job.id])
+            return JsonResponse({'id': str(job.id), 'status': job.status, 'poll_url': poll_url,
+                                 'max_wait_seconds': jobs.max_wait_seconds()}, status=202)
         else:
             return JsonResponse({'errors': form.errors}, status=400)
     else:
         form = ImageUploaderForm()
         return render(request, 'core/analyze_image.html',  context={'form': form})
+
+
+def analyze_image_job(request, job_id):
+    """ Returns the status of an analysis job and, once done, its predictionDTO. A failed job is a result too (200). """
+    jobs.expire(id=job_id)  # The worker may be down: it would never fail the job itself
+    job = get_object_or_404(AnalysisJob.objects.defer('image', 'result_image'), id=job_id)
+    if job.status == AnalysisJob.DONE:
+        predictionDTO = PredictionDTO(crowd_count=job.crowd_count, img_predict_content=None, time_stamp=job.finished_at)
+        overlay_url = reverse('analyze-image-job-overlay', args=[job.id])
+        return JsonResponse({'status': job.status, **predictionDTO.to_dict(), 'overlay_url': overlay_url}, status=200)
+    if job.status == AnalysisJob.FAILED:
+        return JsonResponse({'status': job.status, 'errors': job.error}, status=200)
+    return JsonResponse({'status': job.status}, status=200)
+
+
+def analyze_image_job_overlay(request, job_id):
+    """ Returns the prediction image of a finished analysis job. It never changes: browsers keep it until the job is deleted. """
+    job = get_object_or_404(AnalysisJob.objects.defer('image'), id=job_id, status=AnalysisJob.DONE)
+    response = HttpResponse(job.result_image, content_type=f'image/{job.result_image_format}')
+    patch_cache_control(response, private=True, max_age=settings.ANALYSIS_JOB_RETENTION_SECONDS, immutable=True)
+    return response
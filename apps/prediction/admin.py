@@ -3,3 +3,5 @@ from django.contrib import admin
 from apps.prediction import models
 
 admin.site.register(models.Snapshot)
+admin.site.register(models.Prediction)
+admin.site.register(models.CrowdStatistic)
@@ -0,0 +1,35 @@
+from dataclasses import dataclass
+
+from PIL import Image, ImageStat
+
+HASH_SIZE = 16  # Difference hash of HASH_SIZE x HASH_SIZE bits
+
+
+@dataclass
+class FrameSignature:
+    """ Cheap description of a frame, used to skip inference on frames that did not change or are too dark. """
+    dhash: str  # Hex string
+    brightness: float   # Mean luminance, 0-255
+
+    def distance(self, dhash: str) -> int:
+        """ Number of differing bits with another hash (hamming distance). """
+        return bin(int(self.dhash, 16) ^ int(dhash, 16)).count('1')
+
+
+def decode_frame(image_path) -> Image.Image:
+    """ Decodes a frame once, to be shared by every predictor. """
+    with Image.open(image_path) as img:
+        return img.convert('RGB')
+
+
+def frame_signature(image_path) -> FrameSignature:
+    with Image.open(image_path) as img:
+        img.draft('L', (HASH_SIZE * 8, HASH_SIZE * 8))   # JPEG: decode straight at a reduced scale
+        gray = img.convert('L').resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR)
+    brightness = ImageStat.Stat(gray).mean[0]
+    pixels = gray.load()
+    bits = 0
+    for y in range(HASH_SIZE):
+        for x in range(HASH_SIZE):
+            bits = (bits << 1) | (pixels[x, y] > pixels[x + 1, y])
+    return FrameSignature(dhash=f'{bits:0{HASH_SIZE * HASH_SIZE // 4}x}', brightness=brightness)
@@ -0,0 +1,95 @@
+""" Local job queue for uploaded images, backed by the database (no broker needed).
+
+Web workers only `submit` jobs; `manage.py run_analysis_worker` holds the model and processes them one at a time.
+"""
+import io
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.prediction.models import AnalysisJob
+from predictions.actions.CustomerPredict import CustomerPredict
+
+
+class QueueFull(Exception):
+    pass
+
+
+class RateLimited(Exception):
+    pass
+
+
+def submit(image, client) -> AnalysisJob:
+    """ Queues an uploaded image. Raises QueueFull or RateLimited (both mean: retry later). """
+    expire()    # Jobs no worker took (e.g. it is down) must not fill the queue for good
+    now = timezone.now()
+    max_uploads, seconds = settings.ANALYSIS_RATE_LIMIT
+    if AnalysisJob.objects.filter(client=client, created_at__gte=now - timedelta(seconds=seconds)).count() >= max_uploads:
+        raise RateLimited()
+    if AnalysisJob.objects.filter(status=AnalysisJob.QUEUED).count() >= settings.ANALYSIS_QUEUE_MAX:
+        raise QueueFull()
+    image.seek(0)
+    return AnalysisJob.objects.create(client=client, image=image.read())
+
+
+def claim_next() -> AnalysisJob | None:
+    """ Marks the oldest queued job as running and returns it. Safe with several workers. """
+    while True:
+        job_id = (AnalysisJob.objects
+                  .filter(status=AnalysisJob.QUEUED)
+                  .order_by('created_at')
+                  .values_list('id', flat=True)
+                  .first())
+        if job_id is None:
+            return None
+        claimed = (AnalysisJob.objects
+                   .filter(id=job_id, status=AnalysisJob.QUEUED)
+                   .update(status=AnalysisJob.RUNNING, started_at=timezone.now()))
+        if claimed:
+            return AnalysisJob.objects.get(id=job_id)
+        # Claimed by another worker in the meantime: try the next one
+
+
+def process(job, predictor):
+    predictionDTO = CustomerPredict().handle(io.BytesIO(job.image), predictor)
+    job.finished_at = timezone.now()
+    if predictionDTO is None:
+        job.status = AnalysisJob.FAILED
+        job.error = "Internal Server Error"
+    else:
+        job.status = AnalysisJob.DONE
+        job.crowd_count = predictionDTO.crowd_count
+        job.result_image = predictionDTO.img_predict_content
+        job.result_image_format = predictionDTO.img_predict_format
+    job.image = b''     # Not needed anymore
+    job.save()
+
+
+def expire(**filters) -> int:
+    """ Fails jobs queued or running for longer than ANALYSIS_JOB_TIMEOUT_SECONDS (e.g. the worker is down or was
+        restarted), so that their clients stop waiting. `filters` restrict the jobs checked, e.g. `id=job_id`. """
+    now = timezone.now()
+    too_old = now - timedelta(seconds=settings.ANALYSIS_JOB_TIMEOUT_SECONDS)
+    jobs = AnalysisJob.objects.filter(**filters)
+    return (jobs.filter(status=AnalysisJob.QUEUED, created_at__lt=too_old)
+            .update(status=AnalysisJob.FAILED, finished_at=now, error="No worker took the job", image=b'')
+            + jobs.filter(status=AnalysisJob.RUNNING, started_at__lt=too_old)
+            .update(status=AnalysisJob.FAILED, finished_at=now, error="Timed out", image=b''))
+
+
+def max_wait_seconds() -> int:
+    """ Longest a client may have to wait for the result of a job (queued, then running). """
+    return 2 * settings.ANALYSIS_JOB_TIMEOUT_SECONDS
+
+
+def cleanup():
+    """ Fails stuck jobs (see `expire`) and deletes old finished jobs. """
+    now = timezone.now()
+    with transaction.atomic():
+        expire()
+        (AnalysisJob.objects
+         .filter(created_at__lt=now - timedelta(seconds=settings.ANALYSIS_JOB_RETENTION_SECONDS))
+         .exclude(status__in=[AnalysisJob.QUEUED, AnalysisJob.RUNNING])
+         .delete())
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from apps.core.page_cache import bump_data_generation
+from apps.prediction import statistics
+from apps.webcam.models import WebCam
+
+
+class Command(BaseCommand):
+    help = "Recomputes the crowd statistics rollups (and WebCam.max_crowd_count) from the stored snapshots."
+
+    def add_arguments(self, parser):
+        parser.add_argument('slugs', nargs='*', help="Webcams to rebuild (all of them by default).")
+
+    def handle(self, *args, **options):
+        webcams = WebCam.objects.all()
+        if options['slugs']:
+            webcams = webcams.filter(slug__in=options['slugs'])
+        for webcam in webcams:
+            num_statistics = statistics.rebuild(webcam)
+            self.stdout.write(f"{webcam.beach_name}: {num_statistics} rollups, max crowd count {webcam.max_crowd_count}.")
+        bump_data_generation()
@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.prediction import jobs
+from predictions.classes.CpuBudget import cpu_budget
+from predictions.classes.PredictorFactory import get_predictor
+
+
+class Command(BaseCommand):
+    help = "Processes the images uploaded to the analyze page (apps.prediction.jobs), holding the model in memory."
+
+    def handle(self, *args, **options):
+        cpu_budget.apply('worker')
+        self.stdout.write(cpu_budget.describe())
+        predictor = get_predictor()
+        if hasattr(predictor, 'prepareModel'):
+            predictor.prepareModel()    # Warm up before the first job
+        self.stdout.write("Analysis worker ready.")
+        last_cleanup = 0
+        while True:
+            if time.monotonic() - last_cleanup > 60:
+                jobs.cleanup()
+                last_cleanup = time.monotonic()
+            job = jobs.claim_next()
+            if job is None:
+                time.sleep(settings.ANALYSIS_WORKER_POLL_SECONDS)
+                continue
+            jobs.process(job, predictor)
+            self.stdout.write(f"{job}: {job.crowd_count}")
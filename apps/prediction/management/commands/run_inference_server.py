@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from predictions.classes.BayesianPredictor import BayesianPredictor
+from predictions.classes.CpuBudget import cpu_budget
+from predictions.classes.InferenceServer import InferenceServer
+
+
+class Command(BaseCommand):
+    help = "Serves the crowd model to the cron and the analysis worker over INFERENCE_SERVER_SOCKET (one model per host)."
+
+    def handle(self, *args, **options):
+        if not settings.INFERENCE_SERVER_SOCKET:
+            raise CommandError("INFERENCE_SERVER_SOCKET is not set.")
+        cpu_budget.apply('server')
+        self.stdout.write(cpu_budget.describe())
+        predictor = BayesianPredictor()
+        server = InferenceServer(
+            predictor,
+            settings.INFERENCE_SERVER_SOCKET,
+            settings.INFERENCE_SERVER_AUTHKEY,
+            batch_window=settings.INFERENCE_SERVER_BATCH_WINDOW_SECONDS,
+            max_batch_size=predictor.max_batch_size,
+        )
+        self.stdout.write(f"Inference server listening on {settings.INFERENCE_SERVER_SOCKET}.")
+        server.serve_forever()
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.1 on 2026-10-18 07:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prediction', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='snapshot',
+            name='frame_brightness',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='snapshot',
+            name='frame_hash',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='snapshot',
+            name='inference',
+            field=models.CharField(choices=[('run', 'Predicted'), ('reused', 'Reused from the previous snapshot (frame did not change)'), ('dark', 'Skipped (frame too dark)')], default='run', max_length=10),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-18 07:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prediction', '0003_snapshot_inference_and_frame_signature'),
+        ('webcam', '0013_webcam_latest_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='snapshot',
+            index=models.Index(fields=['webcam', 'ts'], name='prediction__webcam__109ad7_idx'),
+        ),
+    ]
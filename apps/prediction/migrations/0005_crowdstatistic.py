@@ -0,0 +1,37 @@
+# Generated by Django 5.0.1 on 2026-10-18 07:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prediction', '0004_snapshot_webcam_ts_index'),
+        ('webcam', '0013_webcam_latest_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CrowdStatistic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', 'Hourly'), ('day', 'Daily'), ('weekday-hour', 'Weekday by hour'), ('total', 'All time')], max_length=12)),
+                ('key', models.CharField(help_text="Bucket identifier, e.g. '2025-07-01T13' (hour), '2025-07-01' (day), '0-13' (Monday, 13h) or 'all'.", max_length=20)),
+                ('start', models.DateTimeField(blank=True, help_text='Start of the bucket (hourly and daily only).', null=True)),
+                ('weekday', models.PositiveSmallIntegerField(blank=True, help_text='0 is Monday (weekday by hour only).', null=True)),
+                ('hour', models.PositiveSmallIntegerField(blank=True, help_text='Weekday by hour only.', null=True)),
+                ('sample_count', models.IntegerField(default=0)),
+                ('mean', models.FloatField(default=0)),
+                ('p50', models.FloatField(default=0)),
+                ('p95', models.FloatField(default=0)),
+                ('max', models.FloatField(default=0)),
+                ('histogram', models.JSONField(default=dict, help_text='Number of samples per (rounded) crowd count, to keep percentiles exact.')),
+                ('webcam', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='webcam.webcam')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='crowdstatistic',
+            constraint=models.UniqueConstraint(fields=('webcam', 'granularity', 'key'), name='unique_crowd_statistic_bucket'),
+        ),
+    ]
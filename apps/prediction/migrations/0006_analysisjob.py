@@ -0,0 +1,32 @@
+# Generated by Django 5.0.1 on 2026-10-18 07:27
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prediction', '0005_crowdstatistic'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalysisJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('client', models.CharField(help_text='Client address, for rate limiting.', max_length=64)),
+                ('image', models.BinaryField(help_text='Uploaded image, as received.')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('crowd_count', models.FloatField(blank=True, null=True)),
+                ('result_image', models.BinaryField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_at'], name='prediction__status_08813d_idx'), models.Index(fields=['client', 'created_at'], name='prediction__client_ce0bc8_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-18 07:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prediction', '0006_analysisjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisjob',
+            name='result_image_format',
+            field=models.CharField(blank=True, max_length=10),
+        ),
+    ]
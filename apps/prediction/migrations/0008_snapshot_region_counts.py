@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-18 07:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prediction', '0007_analysisjob_result_image_format'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='snapshot',
+            name='region_counts',
+            field=models.JSONField(blank=True, help_text='Crowd count per masked region (beach, swimming, boats).', null=True),
+        ),
+    ]
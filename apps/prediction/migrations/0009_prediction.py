@@ -0,0 +1,47 @@
+# Generated by Django 5.0.1 on 2026-10-18 07:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_snapshot_predictions(apps, schema_editor):
+    """ Every prediction so far was made by BayesianPredictor. """
+    Snapshot = apps.get_model('prediction', 'Snapshot')
+    Prediction = apps.get_model('prediction', 'Prediction')
+    snapshots = (Snapshot.objects
+                 .exclude(predicted_crowd_count__isnull=True)
+                 .values_list('id', 'predicted_crowd_count', 'region_counts', 'predicted_image'))
+    Prediction.objects.bulk_create(
+        (
+            Prediction(snapshot_id=snapshot_id, predictor='bayesian', crowd_count=count, region_counts=region_counts, image=image)
+            for snapshot_id, count, region_counts, image in snapshots.iterator()
+        ),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prediction', '0008_snapshot_region_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Prediction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('predictor', models.CharField(help_text="Name of the predictor, e.g. 'bayesian'.", max_length=50)),
+                ('crowd_count', models.FloatField()),
+                ('region_counts', models.JSONField(blank=True, help_text='Crowd count per masked region (beach, swimming, boats).', null=True)),
+                ('image', models.ImageField(blank=True, null=True, upload_to='img/predictions/')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='predictions', to='prediction.snapshot')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='prediction',
+            constraint=models.UniqueConstraint(fields=('snapshot', 'predictor'), name='unique_prediction_per_predictor'),
+        ),
+        migrations.RunPython(copy_snapshot_predictions, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,20 @@
+import uuid
+
 from django.db import models
 
 from apps.webcam.models import WebCam
 
 
 class Snapshot(models.Model):
+    INFERENCE_RUN = 'run'
+    INFERENCE_REUSED = 'reused'
+    INFERENCE_DARK = 'dark'
+    INFERENCE_CHOICES = [
+        (INFERENCE_RUN, 'Predicted'),
+        (INFERENCE_REUSED, 'Reused from the previous snapshot (frame did not change)'),
+        (INFERENCE_DARK, 'Skipped (frame too dark)'),
+    ]
+
     webcam = models.ForeignKey(WebCam, on_delete=models.CASCADE)
     ts = models.DateTimeField()
     webcam_image = models.ImageField(null=True, blank=True, upload_to='img/originals/')
@@ -11,6 +22,130 @@ class Snapshot(models.Model):
     # Prediction data
     predicted_crowd_count = models.FloatField(null=True)
     predicted_image = models.ImageField(null=True, blank=True, upload_to='img/predictions/')
+    region_counts = models.JSONField(null=True, blank=True, help_text="Crowd count per masked region (beach, swimming, boats).")
+    inference = models.CharField(max_length=10, choices=INFERENCE_CHOICES, default=INFERENCE_RUN)
+    # Frame signature (see apps.prediction.frames)
+    frame_hash = models.CharField(max_length=64, null=True, blank=True)
+    frame_brightness = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['webcam', 'ts']),  # History, latest snapshots
+        ]
 
     def __str__(self):
         return f'Snapshot {self.webcam.beach_name} - {self.ts}'
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        if self.predicted_crowd_count is not None:
+            self.webcam.register_prediction(self)
+
+
+class Prediction(models.Model):
+    """ Result of one predictor on a snapshot. The primary predictor's result is also stored on the snapshot itself. """
+    snapshot = models.ForeignKey(Snapshot, on_delete=models.CASCADE, related_name='predictions')
+    predictor = models.CharField(max_length=50, help_text="Name of the predictor, e.g. 'bayesian'.")
+    crowd_count = models.FloatField()
+    region_counts = models.JSONField(null=True, blank=True, help_text="Crowd count per masked region (beach, swimming, boats).")
+    image = models.ImageField(null=True, blank=True, upload_to='img/predictions/')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['snapshot', 'predictor'], name='unique_prediction_per_predictor'),
+        ]
+
+    def __str__(self):
+        return f'Prediction {self.predictor} - {self.snapshot_id}'
+
+
+class CrowdStatistic(models.Model):
+    """ Rollup of the crowd counts of a webcam over a bucket of time, updated incrementally (see apps.prediction.statistics). """
+    HOUR = 'hour'
+    DAY = 'day'
+    WEEKDAY_HOUR = 'weekday-hour'
+    TOTAL = 'total'
+    GRANULARITIES = [
+        (HOUR, 'Hourly'),
+        (DAY, 'Daily'),
+        (WEEKDAY_HOUR, 'Weekday by hour'),
+        (TOTAL, 'All time'),
+    ]
+
+    webcam = models.ForeignKey(WebCam, on_delete=models.CASCADE)
+    granularity = models.CharField(max_length=12, choices=GRANULARITIES)
+    key = models.CharField(max_length=20, help_text="Bucket identifier, e.g. '2025-07-01T13' (hour), '2025-07-01' (day), '0-13' (Monday, 13h) or 'all'.")
+    start = models.DateTimeField(null=True, blank=True, help_text="Start of the bucket (hourly and daily only).")
+    weekday = models.PositiveSmallIntegerField(null=True, blank=True, help_text="0 is Monday (weekday by hour only).")
+    hour = models.PositiveSmallIntegerField(null=True, blank=True, help_text="Weekday by hour only.")
+    sample_count = models.IntegerField(default=0)
+    mean = models.FloatField(default=0)
+    p50 = models.FloatField(default=0)
+    p95 = models.FloatField(default=0)
+    max = models.FloatField(default=0)
+    histogram = models.JSONField(default=dict, help_text="Number of samples per (rounded) crowd count, to keep percentiles exact.")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['webcam', 'granularity', 'key'], name='unique_crowd_statistic_bucket'),
+        ]
+
+    def __str__(self):
+        return f'{self.get_granularity_display()} statistic {self.webcam.beach_name} - {self.key}'
+
+    def add(self, count):
+        """ Adds one sample to the rollup (does not save). Only the histogram (and so percentiles) uses rounded counts. """
+        key = str(round(count))
+        self.histogram[key] = self.histogram.get(key, 0) + 1
+        self.mean = (self.mean * self.sample_count + count) / (self.sample_count + 1)
+        self.sample_count += 1
+        self.max = max(self.max, count) if self.sample_count > 1 else count
+        self.p50 = self.percentile(50)
+        self.p95 = self.percentile(95)
+
+    def percentile(self, q):
+        """ Nearest-rank percentile of the samples. """
+        rank = max(1, -(-q * self.sample_count // 100))     # ceil(q/100 * n)
+        seen = 0
+        for count in sorted(self.histogram, key=int):
+            seen += self.histogram[count]
+            if seen >= rank:
+                return int(count)
+        return 0
+
+
+class AnalysisJob(models.Model):
+    """ Image uploaded to be analyzed by the analysis worker (see apps.prediction.jobs). """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    client = models.CharField(max_length=64, help_text="Client address, for rate limiting.")
+    image = models.BinaryField(help_text="Uploaded image, as received.")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Result
+    crowd_count = models.FloatField(null=True, blank=True)
+    result_image = models.BinaryField(null=True, blank=True)
+    result_image_format = models.CharField(max_length=10, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at']),  # Claiming jobs, queue length
+            models.Index(fields=['client', 'created_at']),  # Rate limits
+        ]
+
+    def __str__(self):
+        return f'Analysis job {self.id} ({self.status})'
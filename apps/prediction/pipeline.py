@@ -0,0 +1,235 @@
+import math
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from apps.prediction import statistics
+from apps.prediction.frames import decode_frame, frame_signature
+from apps.prediction.models import Prediction, Snapshot
+from apps.webcam import http_client
+
+
+class CapturePipeline:
+    """ Captures webcams in a bounded pool of I/O threads and predicts them in the calling thread as they arrive.
+
+    Capture threads only download files; every database write happens in the thread running `run()`, which also drives
+    the predictors (see `predict`). Captures are limited globally (`CAPTURE_WORKERS`) and per provider
+    kind (`CAPTURE_CONCURRENCY`), and a webcam whose capture runs longer than `CAPTURE_TIMEOUT_SECONDS` is recorded as
+    failed so that a hung stream does not hold up the cycle.
+    """
+
+    def __init__(self, predictors, workers=None, concurrency=None, timeout=None, batch_size=None, predictor_workers=None):
+        self.predictors = predictors
+        self.predictor_workers = predictor_workers or settings.PREDICTOR_WORKERS
+        self.workers = workers or settings.CAPTURE_WORKERS
+        self.timeout = timeout or settings.CAPTURE_TIMEOUT_SECONDS
+        self.batch_size = batch_size or settings.INFERENCE_BATCH_SIZE
+        concurrency = settings.CAPTURE_CONCURRENCY if concurrency is None else concurrency
+        self.semaphores = defaultdict(lambda: None, {
+            kind: threading.BoundedSemaphore(limit) for kind, limit in concurrency.items()
+        })
+        self.jobs = queue.Queue()
+        self.captures = queue.Queue()
+        self.started = {}   # webcam id -> time.monotonic() when its capture started
+        self.deadline = None    # time.monotonic() after which webcams whose capture did not start are given up
+
+    def run(self, webcams):
+        webcams = list(webcams)
+        # Enough for every webcam to take the whole timeout, one round of workers after another (plus one round waiting
+        # for a provider slot)
+        self.deadline = time.monotonic() + (math.ceil(len(webcams) / self.workers) + 1) * self.timeout
+        for beachcam in webcams:
+            self.jobs.put(beachcam)
+        for _ in range(min(self.workers, len(webcams))):
+            # Daemon threads: a capture stuck beyond every timeout must not keep the process alive
+            threading.Thread(target=self.capture_worker, daemon=True).start()
+
+        pending = {beachcam.id: beachcam for beachcam in webcams}
+        batch = []
+        while pending:
+            try:
+                beachcam, ts, result = self.captures.get(block=not batch, timeout=1)
+            except queue.Empty:
+                if batch:
+                    self.predict(batch)
+                    batch = []
+                self.expire(pending)
+                continue
+            if pending.pop(beachcam.id, None) is None:
+                continue    # Already given up on
+            if isinstance(result, http_client.NotModified):
+                print(f"Webcam {beachcam.beach_name} did not change since its last snapshot.")
+                continue
+            if isinstance(result, Exception):
+                print(f"Capture of webcam {beachcam.beach_name} failed.")
+                beachcam.record_failure(result)
+                continue
+            snapshot = beachcam.record_snapshot(ts, *result)
+            print(f"Snapshot created for webcam {beachcam.beach_name}.")
+            if not self.needs_inference(snapshot):
+                continue
+            batch.append(snapshot)
+            if len(batch) >= self.batch_size:
+                self.predict(batch)
+                batch = []
+        if batch:
+            self.predict(batch)
+
+    def capture_worker(self):
+        try:
+            while True:
+                try:
+                    beachcam = self.jobs.get_nowait()
+                except queue.Empty:
+                    return
+                semaphore = self.semaphores[beachcam.provider_kind()]
+                # Waiting for a slot is bounded too: a waiting worker is not tracked by `expire`
+                if semaphore is not None and not semaphore.acquire(timeout=self.timeout):
+                    self.captures.put((beachcam, timezone.now(), TimeoutError(f"No capture slot after {self.timeout}s.")))
+                    continue
+                try:
+                    self.started[beachcam.id] = time.monotonic()
+                    ts = timezone.now()
+                    try:
+                        result = beachcam.download_video_and_image(timestamp=ts, timeout=self.timeout)
+                    except Exception as e:
+                        result = e
+                    self.captures.put((beachcam, ts, result))
+                finally:
+                    if semaphore is not None:
+                        semaphore.release()
+        finally:
+            connection.close()
+
+    def expire(self, pending):
+        """ Records as failed every pending capture that has been running for longer than the per-webcam timeout, and
+            once the cycle deadline has passed, every one that did not start (e.g. all workers are stuck in a step that
+            ignores its deadline). """
+        now = time.monotonic()
+        for webcam_id, started in list(self.started.items()):
+            if webcam_id in pending and now - started > self.timeout:
+                beachcam = pending.pop(webcam_id)
+                print(f"Capture of webcam {beachcam.beach_name} timed out.")
+                beachcam.record_failure(TimeoutError(f"Capture took longer than {self.timeout}s."))
+        if now > self.deadline:
+            while True:     # Workers that free up later must not start them anymore
+                try:
+                    self.jobs.get_nowait()
+                except queue.Empty:
+                    break
+            for webcam_id in [webcam_id for webcam_id in pending if webcam_id not in self.started]:
+                beachcam = pending.pop(webcam_id)
+                print(f"Capture of webcam {beachcam.beach_name} never started.")
+                beachcam.record_failure(TimeoutError("No capture worker was available before the end of the cycle."))
+
+    def needs_inference(self, snapshot):
+        """ Skips the model on dark frames and on frames that did not change since the previous scored snapshot. """
+        try:
+            signature = frame_signature(snapshot.webcam_image.path)
+        except Exception as e:
+            print(f"pipeline.py could not compute frame signature: {e}")
+            return True
+        snapshot.frame_hash = signature.dhash
+        snapshot.frame_brightness = signature.brightness
+
+        if signature.brightness < settings.DARK_FRAME_BRIGHTNESS:
+            snapshot.inference = Snapshot.INFERENCE_DARK
+            snapshot.predicted_crowd_count = 0
+            snapshot.predicted_image.name = snapshot.webcam_image.name
+            snapshot.save()
+            Prediction.objects.bulk_create([
+                Prediction(snapshot=snapshot, predictor=predictor.name, crowd_count=0, image=snapshot.webcam_image.name)
+                for predictor in self.predictors
+            ])
+            print(f"  Dark frame, inference skipped for webcam {snapshot.webcam.beach_name}.")
+            return False
+
+        # Only frames that were actually predicted, and recently: comparing with reused frames would let a slowly
+        # changing scene keep an old prediction forever, and with dark frames would spread their count of 0
+        previous = (snapshot.webcam.snapshot_set
+                    .exclude(pk=snapshot.pk)
+                    .filter(inference=Snapshot.INFERENCE_RUN,
+                            ts__gte=snapshot.ts - timedelta(seconds=settings.UNCHANGED_FRAME_MAX_AGE_SECONDS))
+                    .exclude(frame_hash__isnull=True)
+                    .exclude(predicted_crowd_count__isnull=True)
+                    .order_by('-ts')
+                    .first())
+        if previous is not None and signature.distance(previous.frame_hash) <= settings.UNCHANGED_FRAME_MAX_DISTANCE:
+            snapshot.inference = Snapshot.INFERENCE_REUSED
+            snapshot.predicted_crowd_count = previous.predicted_crowd_count
+            snapshot.region_counts = previous.region_counts
+            snapshot.predicted_image.name = previous.predicted_image.name
+            snapshot.save()
+            Prediction.objects.bulk_create([
+                Prediction(snapshot=snapshot, predictor=prediction.predictor, crowd_count=prediction.crowd_count,
+                           region_counts=prediction.region_counts, image=prediction.image.name)
+                for prediction in previous.predictions.all()
+            ])
+            statistics.record(snapshot)
+            print(f"  Frame did not change, prediction reused for webcam {snapshot.webcam.beach_name}.")
+            return False
+
+        snapshot.save()
+        return True
+
+    def predict(self, snapshots):
+        """ Decodes every frame once and runs all the predictors on the decoded frames, up to `PREDICTOR_WORKERS` of them
+            concurrently. Results are saved in this thread. The first predictor is the primary one (see save_prediction). """
+        frames, decoded = [], []
+        for snapshot in snapshots:
+            try:
+                frames.append(decode_frame(snapshot.webcam_image.path))
+                decoded.append(snapshot)
+            except Exception as e:
+                print(f"pipeline.py could not decode the frame of webcam {snapshot.webcam.beach_name}: {e}")
+        if not decoded:
+            return
+        mask_paths_list = [snapshot.webcam.mask_paths() for snapshot in decoded]
+
+        with ThreadPoolExecutor(max_workers=min(self.predictor_workers, len(self.predictors))) as executor:
+            # Batched: same-resolution snapshots share a forward pass
+            futures = [executor.submit(predictor.predict_batch, frames, mask_paths_list) for predictor in self.predictors]
+            for predictor, future in zip(self.predictors, futures):
+                try:
+                    predictionDTOs = future.result()
+                    print(f'Predictions of {predictor.name} done ({len(predictionDTOs)} snapshots).')
+                except Exception as e:
+                    print(f"pipeline.py an error ocurred ({predictor.name}): {e}")
+                    continue
+
+                for snapshot, predictionDTO in zip(decoded, predictionDTOs):
+                    try:
+                        self.save_prediction(snapshot, predictor, predictionDTO)
+                        print(f'  Prediction of {predictor.name} saved for webcam {snapshot.webcam.beach_name}.')
+                    except Exception as e:
+                        # Handle any exception
+                        print(f"pipeline.py an error ocurred: {e}")
+                        # TODO: make it NOT available.
+
+    def save_prediction(self, snapshot, predictor, predictionDTO):
+        """ Stores a predictor's result. The primary predictor's result is mirrored on the snapshot (pages, statistics). """
+        beachcam = snapshot.webcam
+        primary = predictor is self.predictors[0]
+        subfolder = 'img/predictions/' if primary else f'img/predictions/{predictor.name}/'
+        prediction_image_path = beachcam.relative_filepath(timestamp=snapshot.ts, subfolder=subfolder, extension=f'.{predictionDTO.img_predict_format}')
+        with open(os.path.join(settings.MEDIA_ROOT, prediction_image_path), 'wb') as f:
+            f.write(predictionDTO.img_predict_content)
+        Prediction.objects.update_or_create(snapshot=snapshot, predictor=predictor.name, defaults={
+            'crowd_count': predictionDTO.crowd_count,
+            'region_counts': predictionDTO.region_counts,
+            'image': prediction_image_path,
+        })
+        if primary:
+            snapshot.predicted_crowd_count = predictionDTO.crowd_count
+            snapshot.region_counts = predictionDTO.region_counts
+            snapshot.predicted_image.name = prediction_image_path
+            snapshot.save()
+            statistics.record(snapshot)
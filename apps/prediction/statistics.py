@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.prediction.models import CrowdStatistic, Snapshot
+from apps.webcam.models import WebCam
+
+
+def buckets(ts):
+    """ Returns (granularity, key, fields) of every rollup a snapshot taken at `ts` belongs to (in local time). """
+    ts = timezone.localtime(ts)
+    hour_start = ts.replace(minute=0, second=0, microsecond=0)
+    return [
+        (CrowdStatistic.HOUR, hour_start.strftime('%Y-%m-%dT%H'), {'start': hour_start}),
+        (CrowdStatistic.DAY, hour_start.strftime('%Y-%m-%d'), {'start': hour_start.replace(hour=0)}),
+        (CrowdStatistic.WEEKDAY_HOUR, f'{ts.weekday()}-{ts.hour}', {'weekday': ts.weekday(), 'hour': ts.hour}),
+        (CrowdStatistic.TOTAL, 'all', {}),
+    ]
+
+
+def is_sample(snapshot):
+    """ Dark frames are not predicted (their count is not a measurement). """
+    return snapshot.predicted_crowd_count is not None and snapshot.inference != Snapshot.INFERENCE_DARK
+
+
+def record(snapshot):
+    """ Adds a scored snapshot to its webcam's rollups and updates the webcam's colour scale. Call once per snapshot. """
+    if not is_sample(snapshot):
+        return
+    with transaction.atomic():
+        for granularity, key, fields in buckets(snapshot.ts):
+            statistic, _ = CrowdStatistic.objects.select_for_update().get_or_create(
+                webcam=snapshot.webcam, granularity=granularity, key=key, defaults=fields,
+            )
+            statistic.add(snapshot.predicted_crowd_count)
+            statistic.save()
+            if granularity == CrowdStatistic.TOTAL:
+                running_max = max(snapshot.webcam.max_crowd_count, round(snapshot.predicted_crowd_count))
+                update_max_crowd_count(snapshot.webcam, statistic, running_max)
+
+
+def update_max_crowd_count(webcam, total, running_max):
+    """ Uses the p95 of all samples as the top of the webcam's colour scale, so that outliers do not flatten it.
+        Until there are enough samples, the running max is used instead. """
+    if total.sample_count >= settings.CROWD_STATISTICS_MIN_SAMPLES:
+        max_crowd_count = max(1, round(total.p95))
+    else:
+        max_crowd_count = round(running_max)
+    if max_crowd_count != webcam.max_crowd_count:
+        webcam.max_crowd_count = max_crowd_count
+        WebCam.objects.filter(pk=webcam.pk).update(max_crowd_count=max_crowd_count)
+
+
+def rebuild(webcam):
+    """ Recomputes every rollup of the webcam from its snapshots. """
+    statistics = {}
+    snapshots = (Snapshot.objects
+                 .filter(webcam=webcam)
+                 .exclude(predicted_crowd_count__isnull=True)
+                 .exclude(inference=Snapshot.INFERENCE_DARK)
+                 .values_list('ts', 'predicted_crowd_count'))
+    for ts, count in snapshots.iterator():
+        for granularity, key, fields in buckets(ts):
+            if (granularity, key) not in statistics:
+                statistics[granularity, key] = CrowdStatistic(webcam=webcam, granularity=granularity, key=key, **fields)
+            statistics[granularity, key].add(count)
+    with transaction.atomic():
+        CrowdStatistic.objects.filter(webcam=webcam).delete()
+        CrowdStatistic.objects.bulk_create(statistics.values(), batch_size=500)
+        total = statistics.get((CrowdStatistic.TOTAL, 'all'))
+        if total is not None:
+            update_max_crowd_count(webcam, total, total.max)
+    return len(statistics)
+
+
+def weekly_profile(webcam):
+    """ Returns [[hour, weekday, mean count], ...] for every weekday-by-hour bucket with samples. """
+    return [
+        [hour, weekday, round(mean, 1)]
+        for weekday, hour, mean in CrowdStatistic.objects
+        .filter(webcam=webcam, granularity=CrowdStatistic.WEEKDAY_HOUR)
+        .values_list('weekday', 'hour', 'mean')
+    ]
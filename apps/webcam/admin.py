@@ -1,5 +1,20 @@
 from django.contrib import admin
 
+from apps.core.page_cache import bump_data_generation
 from apps.webcam import models
 
-admin.site.register(models.WebCam)
+
+@admin.register(models.WebCam)
+class WebCamAdmin(admin.ModelAdmin):
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        bump_data_generation()
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        bump_data_generation()
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        bump_data_generation()
@@ -0,0 +1,95 @@
+import atexit
+import queue
+import threading
+
+from django.conf import settings
+from selenium.common import WebDriverException
+from selenium.webdriver.chrome.options import Options
+from seleniumwire import webdriver  # Import from seleniumwire
+
+
+class BrowserPool:
+    """ Keeps up to `size` warm headless Chrome drivers (seleniumwire), recycled after `max_uses` captures.
+
+    Every driver is quit when recycled, when a capture using it fails (its state is unknown) and at process exit.
+    """
+
+    def __init__(self, size, max_uses):
+        self.max_uses = max_uses
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = queue.LifoQueue()
+        self._uses = {}
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def acquire(self, timeout=None):
+        """ Returns a driver with no captured requests. Must be given back with `release`.
+            Raises TimeoutError if no driver is available within `timeout` seconds. """
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError(f"No browser available after {timeout}s.")
+        try:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                driver = self._new_driver()
+            del driver.requests     # Forget the requests captured during the previous use
+            return driver
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, driver, broken=False):
+        try:
+            with self._lock:
+                self._uses[driver] += 1
+                recycle = broken or self._uses[driver] >= self.max_uses
+            if recycle:
+                self._quit(driver)
+            else:
+                self._idle.put(driver)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """ Quits every driver, idle or not. """
+        with self._lock:
+            drivers = list(self._uses)
+        for driver in drivers:
+            self._quit(driver)
+
+    def _new_driver(self):
+        options = Options()
+        options.add_argument('--headless=new')
+        seleniumwire_options = {
+            'request_storage': 'memory',
+            'request_storage_max_size': 100,    # Warm drivers must not grow forever
+        }
+        try:
+            driver = webdriver.Chrome("/usr/bin/chromedriver", options=options, seleniumwire_options=seleniumwire_options)    # Ubuntu
+        except (WebDriverException, TypeError):
+            driver = webdriver.Chrome(options=options, seleniumwire_options=seleniumwire_options)  # MacOS
+        driver.scopes = [r'.*\.m3u8.*']     # Only capture the requests we look for
+        with self._lock:
+            self._uses[driver] = 0
+        return driver
+
+    def _quit(self, driver):
+        with self._lock:
+            self._uses.pop(driver, None)
+        try:
+            driver.quit()
+        except Exception as e:
+            print(f"BrowserPool: error quitting driver: {e}")
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def browser_pool() -> BrowserPool:
+    """ Returns the process-wide pool, created on first use. """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool(settings.BROWSER_POOL_SIZE, settings.BROWSER_MAX_USES)
+        return _pool
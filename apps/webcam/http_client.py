@@ -0,0 +1,70 @@
+import os
+import threading
+from dataclasses import dataclass
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class NotModified(Exception):
+    """ The provider answered 304: the resource did not change since the last download. """
+
+
+@dataclass
+class Download:
+    status_code: int
+    bytes: int
+    etag: str | None
+    last_modified: str | None
+
+
+def session() -> requests.Session:
+    """ Returns the process-wide pooled session (keeps connections alive per host, shared by the capture threads). """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=settings.HTTP_POOL_HOSTS, pool_maxsize=settings.CAPTURE_WORKERS)
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+        return _session
+
+
+def get(url, **kwargs) -> requests.Response:
+    kwargs.setdefault('timeout', settings.HTTP_TIMEOUT)
+    return session().get(url, **kwargs)
+
+
+def download_to_file(url, file_path, etag=None, last_modified=None, **kwargs) -> Download:
+    """ Streams `url` into `file_path` without buffering the body in memory.
+        Sends `If-None-Match`/`If-Modified-Since` when validators are given, and raises NotModified on a 304. """
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    with get(url, headers=headers, stream=True, **kwargs) as response:
+        if response.status_code == 304:
+            raise NotModified(url)
+        response.raise_for_status()
+        tmp_path = f'{file_path}.part'
+        num_bytes = 0
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    f.write(chunk)
+                    num_bytes += len(chunk)
+            os.replace(tmp_path, file_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return Download(
+            status_code=response.status_code,
+            bytes=num_bytes,
+            etag=response.headers.get('ETag'),
+            last_modified=response.headers.get('Last-Modified'),
+        )
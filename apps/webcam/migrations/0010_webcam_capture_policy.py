@@ -0,0 +1,28 @@
+# Generated by Django 5.0.1 on 2026-10-18 07:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webcam', '0009_webcam_mask_beach_webcam_mask_boats_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webcam',
+            name='capture_policy',
+            field=models.CharField(choices=[('image', 'Image only'), ('image+video', 'Image and video'), ('video-every-n', 'Image, and video every N captures')], default='image+video', help_text='Image only stops the stream at the first keyframe (no video is recorded). Static image providers never record video.', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='webcam',
+            name='num_captures',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='webcam',
+            name='video_every_n_captures',
+            field=models.PositiveIntegerField(default=6, help_text="Only for the 'video every N captures' policy."),
+        ),
+    ]
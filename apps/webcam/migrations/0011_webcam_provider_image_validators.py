@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-18 07:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webcam', '0010_webcam_capture_policy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webcam',
+            name='provider_image_validators',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='HTTP validators (url, ETag, Last-Modified) of the last downloaded image.'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.1 on 2026-10-18 07:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webcam', '0011_webcam_provider_image_validators'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webcam',
+            name='resolved_stream_expires_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='webcam',
+            name='resolved_stream_url',
+            field=models.CharField(blank=True, editable=False, max_length=2048, null=True),
+        ),
+    ]
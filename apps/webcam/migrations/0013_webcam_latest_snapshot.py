@@ -0,0 +1,29 @@
+# Generated by Django 5.0.1 on 2026-10-18 07:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def set_latest_snapshots(apps, schema_editor):
+    WebCam = apps.get_model('webcam', 'WebCam')
+    Snapshot = apps.get_model('prediction', 'Snapshot')
+    for webcam in WebCam.objects.all():
+        latest = Snapshot.objects.filter(webcam=webcam).exclude(predicted_crowd_count__isnull=True).order_by('-ts').first()
+        WebCam.objects.filter(pk=webcam.pk).update(latest_snapshot=latest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prediction', '0003_snapshot_inference_and_frame_signature'),
+        ('webcam', '0012_webcam_resolved_stream'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webcam',
+            name='latest_snapshot',
+            field=models.ForeignKey(blank=True, editable=False, help_text='Most recent snapshot with a prediction (kept up to date by Snapshot.save).', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='prediction.snapshot'),
+        ),
+        migrations.RunPython(set_latest_snapshots, migrations.RunPython.noop),
+    ]
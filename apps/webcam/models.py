@@ -1,18 +1,29 @@
 import os
 import re
+import time
 from datetime import timedelta
 
-import requests
 from django.conf import settings
 from django.db import models
+from django.db.models import Avg
+from django.db.models.functions import TruncDay, TruncHour
 from django.template.defaultfilters import slugify
 from django.utils import timezone
 from yt_dlp import YoutubeDL
 
-from apps.webcam import utils
+from apps.webcam import http_client, utils
 
 
 class WebCam(models.Model):
+    CAPTURE_IMAGE = 'image'
+    CAPTURE_IMAGE_AND_VIDEO = 'image+video'
+    CAPTURE_VIDEO_EVERY_N = 'video-every-n'
+    CAPTURE_POLICIES = [
+        (CAPTURE_IMAGE, 'Image only'),
+        (CAPTURE_IMAGE_AND_VIDEO, 'Image and video'),
+        (CAPTURE_VIDEO_EVERY_N, 'Image, and video every N captures'),
+    ]
+
     # Beach info
     beach_name = models.CharField(max_length=200, unique=True)
     slug = models.CharField(max_length=200, unique=True, blank=True, null=True)
@@ -21,6 +32,8 @@ class WebCam(models.Model):
     description = models.CharField(max_length=255, blank=True, null=True)
     # Cam/probing info
     num_consecutive_failures = models.IntegerField(default=0)
+    num_captures = models.IntegerField(default=0)
+    latest_snapshot = models.ForeignKey('prediction.Snapshot', on_delete=models.SET_NULL, blank=True, null=True, editable=False, related_name='+', help_text="Most recent snapshot with a prediction (kept up to date by Snapshot.save).")
     max_crowd_count = models.IntegerField(default=0)
     # Image masks
     mask_beach = models.ImageField(upload_to='masks/beach/', blank=True, null=True, help_text="Mask of the beach area (sand, areas with people, etc). For non-movable webcams only.")
@@ -29,8 +42,11 @@ class WebCam(models.Model):
     # Webcam info
     public_url = models.CharField(max_length=2048, blank=True, null=True, help_text="URL to redirect viewers to original source.")
     video_seconds = models.IntegerField(default=10, help_text="Seconds to record for the video", blank=True)
+    capture_policy = models.CharField(max_length=20, choices=CAPTURE_POLICIES, default=CAPTURE_IMAGE_AND_VIDEO, help_text="Image only stops the stream at the first keyframe (no video is recorded). Static image providers never record video.")
+    video_every_n_captures = models.PositiveIntegerField(default=6, help_text="Only for the 'video every N captures' policy.")
     # Webcam info: if provider is static image
     provider_image_url = models.CharField(max_length=2048, help_text="Can use `%Y`, `%m`, `%d`, etc. as in python's strftime(...)", blank=True, null=True)
+    provider_image_validators = models.JSONField(default=dict, blank=True, editable=False, help_text="HTTP validators (url, ETag, Last-Modified) of the last downloaded image.")
     # Webcam info: if provider is static image
     provider_stream_m3u8_url = models.CharField(max_length=2048, help_text=".m3u8 static url", blank=True, null=True)
     # Webcam info: if provider is m3u8 stream obtainable after parsing .html file (selenium not needed)
@@ -42,6 +58,9 @@ class WebCam(models.Model):
     provider_streamfromclick_clickable_element_xpath = models.CharField(max_length=2048, help_text="XPath to the clickable element that generates the stream.", blank=True, null=True)
     # Webcam info: if provider is static image
     provider_youtube_url = models.CharField(max_length=2048, help_text="Only for https://www.youtube.com/watch?v=(...) links.", blank=True, null=True)
+    # Webcam info: .m3u8 url resolved from the regex, click or youtube provider (cached, see `stream_url`)
+    resolved_stream_url = models.CharField(max_length=2048, blank=True, null=True, editable=False)
+    resolved_stream_expires_at = models.DateTimeField(blank=True, null=True, editable=False)
 
     def __str__(self):
         return self.beach_name
@@ -59,13 +78,42 @@ class WebCam(models.Model):
         super(WebCam, self).save(*args, **kwargs)
 
     def last_prediction(self):
-        return self.snapshot_set.exclude(predicted_crowd_count__isnull=True).order_by('-ts').first()
+        """ Denormalized: use `select_related('latest_snapshot')` when listing webcams to avoid one query per webcam. """
+        latest = self.latest_snapshot
+        if latest is not None:
+            latest.webcam = self    # Spares a query when rendering the snapshot (its __str__ uses the webcam)
+        return latest
+
+    def register_prediction(self, snapshot):
+        """ Points `latest_snapshot` to `snapshot` if it is the most recent one with a prediction. """
+        latest = self.latest_snapshot
+        if latest is None or latest.ts <= snapshot.ts:
+            self.latest_snapshot = snapshot
+            WebCam.objects.filter(pk=self.pk).update(latest_snapshot=snapshot)
 
-    def history(self):
+    def history(self, since=None, until=None, resolution=None):
+        """ Returns [(ts, crowd count), ...] of scored snapshots in [since, until), oldest first.
+            With `resolution` ('hour' or 'day'), counts are averaged per bucket (computed by the database). """
         from apps.prediction.models import Snapshot
-        #dt_since = timezone.now() - timedelta(days=100)
-        #return list(Snapshot.objects.filter(webcam=self).filter(ts__gt=dt_since).order_by('ts').all())
-        return list(Snapshot.objects.filter(webcam=self).order_by('ts').all())
+        snapshots = Snapshot.objects.filter(webcam=self).exclude(predicted_crowd_count__isnull=True)
+        if since is not None:
+            snapshots = snapshots.filter(ts__gte=since)
+        if until is not None:
+            snapshots = snapshots.filter(ts__lt=until)
+        if resolution is None:
+            return list(snapshots.order_by('ts').values_list('ts', 'predicted_crowd_count'))
+        trunc = {'hour': TruncHour, 'day': TruncDay}[resolution]
+        return list(snapshots
+                    .annotate(bucket=trunc('ts'))
+                    .values('bucket')
+                    .annotate(count=Avg('predicted_crowd_count'))
+                    .order_by('bucket')
+                    .values_list('bucket', 'count'))
+
+    def mask_paths(self):
+        """ Returns {region: mask file path} of the masks that are set. """
+        masks = {'beach': self.mask_beach, 'swimming': self.mask_swimming, 'boats': self.mask_boats}
+        return {region: mask.path for region, mask in masks.items() if mask}
 
     def relative_filepath(self, timestamp=None, subfolder=None, extension=None):
         """ Returns a filepath relative to MEDIA_ROOT. """
@@ -78,64 +126,142 @@ class WebCam(models.Model):
         os.makedirs(os.path.join(settings.MEDIA_ROOT, os.path.dirname(path)), exist_ok=True)
         return path
     
+    def provider_kind(self):
+        """ Returns the kind of provider used to capture this webcam (used to limit concurrency per kind). """
+        if self.provider_image_url:
+            return 'image'
+        elif self.provider_stream_m3u8_url:
+            return 'stream'
+        elif self.provider_streamfromregex_url:
+            return 'regex'
+        elif self.provider_streamfromclick_url:
+            return 'click'
+        elif self.provider_youtube_url:
+            return 'youtube'
+        return None
+
     def create_snapshot(self):
-        from apps.prediction.models import Snapshot
         ts = timezone.now()
         try:
             video_path, image_path = self.download_video_and_image(timestamp=ts)
-            snapshot = Snapshot.objects.create(
-                webcam=self,
-                ts=ts,
-                predicted_crowd_count=None,
-            )
-            snapshot.webcam_video.name = video_path
-            snapshot.webcam_image.name = image_path
-            snapshot.save()
-            self.num_consecutive_failures = 0
-            self.save()
-            return snapshot
+            return self.record_snapshot(ts, video_path, image_path)
+        except http_client.NotModified:
+            return None     # Same image as the last snapshot: nothing to store nor predict
         except Exception as e:
-            print(e)
-            # TODO: log error
-            self.num_consecutive_failures += 1
-            self.save()
+            self.record_failure(e)
+
+    def record_snapshot(self, ts, video_path, image_path):
+        """ Stores a successful capture. Kept apart from the download so that captures can run in worker threads. """
+        from apps.prediction.models import Snapshot
+        snapshot = Snapshot.objects.create(
+            webcam=self,
+            ts=ts,
+            predicted_crowd_count=None,
+        )
+        snapshot.webcam_video.name = video_path
+        snapshot.webcam_image.name = image_path
+        snapshot.save()
+        self.num_consecutive_failures = 0
+        self.num_captures += 1
+        self.save()
+        return snapshot
 
-    def download_video_and_image(self, timestamp=None):
-        """ Downloads the video and image from the provider. """
+    def record_failure(self, error):
+        print(error)
+        # TODO: log error
+        self.num_consecutive_failures += 1
+        self.save()
+
+    def wants_video(self):
+        """ Whether the next capture should record a video, according to `capture_policy`. """
+        if self.capture_policy == self.CAPTURE_IMAGE_AND_VIDEO:
+            return True
+        elif self.capture_policy == self.CAPTURE_VIDEO_EVERY_N:
+            return self.num_captures % max(self.video_every_n_captures, 1) == 0
+        return False
+
+    def download_video_and_image(self, timestamp=None, timeout=None):
+        """ Downloads the video and image from the provider, giving up after `timeout` secs in total (every step only gets
+            the time left, see utils.remaining). """
         timestamp = timestamp or timezone.now()
+        deadline = time.monotonic() + (timeout or settings.CAPTURE_TIMEOUT_SECONDS)
         image_path = self.relative_filepath(timestamp=timestamp, subfolder='img/originals/', extension='.jpg')
-        video_path = self.relative_filepath(timestamp=timestamp, subfolder='vid/originals/', extension='.mp4')
+        video_path = self.relative_filepath(timestamp=timestamp, subfolder='vid/originals/', extension='.mp4') if self.wants_video() else None
         if self.provider_image_url:
             url = timestamp.strftime(self.provider_image_url)
-            with open(os.path.join(settings.MEDIA_ROOT, image_path), 'wb') as f:
-                f.write(requests.get(url, verify=False).content)
+            validators = self.provider_image_validators if self.provider_image_validators.get('url') == url else {}
+            download = http_client.download_to_file(
+                url,
+                os.path.join(settings.MEDIA_ROOT, image_path),
+                etag=validators.get('etag'),
+                last_modified=validators.get('last_modified'),
+                verify=False,
+            )
+            # Saved along with the snapshot (see record_snapshot), not from the capture thread
+            self.provider_image_validators = {'url': url, 'etag': download.etag, 'last_modified': download.last_modified}
             return None, image_path
-        elif self.provider_stream_m3u8_url:
-            utils.video_and_image_from_m3u8(self.provider_stream_m3u8_url, self.video_seconds, os.path.join(settings.MEDIA_ROOT, video_path), os.path.join(settings.MEDIA_ROOT, image_path))
-            return video_path, image_path
-        elif self.provider_streamfromregex_url:
-            response = requests.get(self.provider_streamfromregex_url)
-            if response.status_code == 200:
-                content = response.text
-                regex = self.provider_streamfromregex_regex.encode().decode('unicode-escape')   # Avoid escaping
-                match = re.search(regex, content)
-                if match is None:
-                    raise ValueError(f"Regex '{regex}' did not match any content.")
-                m3u8_url = self.provider_streamfromregex_strformat.format(**match.groupdict())
-                utils.video_and_image_from_m3u8(m3u8_url, self.video_seconds, os.path.join(settings.MEDIA_ROOT, video_path), os.path.join(settings.MEDIA_ROOT, image_path))
+        elif self.provider_kind() is not None:
+            stream_url, cached = self.stream_url(timeout=utils.remaining(deadline))
+            try:
+                self.capture_stream(stream_url, video_path, image_path, timeout=utils.remaining(deadline))
+            except utils.CaptureError:
+                if not cached:
+                    self.resolved_stream_expires_at = None    # Do not reuse a url that just failed
+                    raise
+                # The cached url stopped working before its TTL: resolve it again and retry once
+                try:
+                    stream_url, _ = self.stream_url(refresh=True, timeout=utils.remaining(deadline))
+                    self.capture_stream(stream_url, video_path, image_path, timeout=utils.remaining(deadline))
+                except Exception:
+                    self.resolved_stream_expires_at = None    # Do not reuse a url that just failed
+                    raise
             return video_path, image_path
+        raise NotImplementedError()
+
+    def stream_url(self, refresh=False, timeout=None):
+        """ Returns the .m3u8 url to capture and whether it comes from the resolved stream cache.
+            The cache is saved along with the snapshot (see record_snapshot), not from the capture thread. """
+        if self.provider_stream_m3u8_url:
+            return self.provider_stream_m3u8_url, False
+        if not refresh and self.resolved_stream_url and self.resolved_stream_expires_at and self.resolved_stream_expires_at > timezone.now():
+            return self.resolved_stream_url, True
+        self.resolved_stream_url = self.resolve_stream_url(timeout=timeout)
+        self.resolved_stream_expires_at = timezone.now() + timedelta(seconds=settings.RESOLVED_STREAM_TTL_SECONDS)
+        return self.resolved_stream_url, False
+
+    def resolve_stream_url(self, timeout=None):
+        """ Obtains the .m3u8 url from the regex, click or youtube provider. Expensive: see `stream_url`. """
+        if self.provider_streamfromregex_url:
+            response = http_client.get(self.provider_streamfromregex_url)
+            response.raise_for_status()
+            content = response.text
+            regex = self.provider_streamfromregex_regex.encode().decode('unicode-escape')   # Avoid escaping
+            match = re.search(regex, content)
+            if match is None:
+                raise ValueError(f"Regex '{regex}' did not match any content.")
+            return self.provider_streamfromregex_strformat.format(**match.groupdict())
         elif self.provider_streamfromclick_url:
-            stream_urls = utils.m3u8_from_clickable_element(self.provider_streamfromclick_url, self.provider_streamfromclick_clickable_element_xpath)
-            utils.video_and_image_from_m3u8(stream_urls[0], self.video_seconds, os.path.join(settings.MEDIA_ROOT, video_path), os.path.join(settings.MEDIA_ROOT, image_path))
-            return video_path, image_path
+            stream_urls = utils.m3u8_from_clickable_element(self.provider_streamfromclick_url, self.provider_streamfromclick_clickable_element_xpath, timeout=timeout)
+            return stream_urls[0].url
         elif self.provider_youtube_url:
-            with YoutubeDL({'format': 'bestvideo/best'}) as ydl:
+            with YoutubeDL({'format': 'bestvideo/best', 'socket_timeout': timeout}) as ydl:
                 result = ydl.extract_info(
                     self.provider_youtube_url,
                     download=False  # We just want to extract the info
                 )
             video = result['entries'][0] if 'entries' in result else result  # Can be a playlist or a list of videos
-            stream_url = video['url']
-            utils.video_and_image_from_m3u8(stream_url, self.video_seconds, os.path.join(settings.MEDIA_ROOT, video_path), os.path.join(settings.MEDIA_ROOT, image_path))
-            return video_path, image_path
+            return video['url']
         raise NotImplementedError()
+
+    def capture_stream(self, stream_url, video_path, image_path, timeout=None):
+        """ Captures video (if `video_path`) and image (relative to MEDIA_ROOT) from the stream, raises if ffmpeg fails. """
+        result = utils.video_and_image_from_m3u8(
+            stream_url,
+            self.video_seconds,
+            os.path.join(settings.MEDIA_ROOT, video_path) if video_path else None,
+            os.path.join(settings.MEDIA_ROOT, image_path),
+            timeout=timeout,
+        )
+        if not result.ok:
+            raise utils.CaptureError(result)
+        return result
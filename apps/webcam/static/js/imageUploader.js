@@ -5,6 +5,8 @@ const formQuery = "form.image-uploader";
 const loaderQuery = "div.loader";
 const analyze_image_url = "/analitza/";
 const p_show_result = "p-show-result";
+const job_poll_interval = 1000;  // ms
+const job_default_max_wait = 600;  // s, when the server does not tell (see jobs.max_wait_seconds)
 
 /**
  * Initialize ImageUploaderForms events
@@ -59,7 +61,7 @@ function showLoader($form) {
 
 
 /**
- * Submit the form via AJAX
+ * Submit the form via AJAX. The image is queued and analyzed in the background: poll the job until it is done
  */
 async function submitForm(form) {
     const formData = new FormData(form);
@@ -70,18 +72,57 @@ async function submitForm(form) {
             'X-CSRFToken': $('input[name="csrfmiddlewaretoken"]').val()
         }
     })
-        .then(response => response.json())
+        .then(response => {
+            if (response.status === 429) {
+                throw new BusyError(response.headers.get('Retry-After'));
+            }
+            if (!response.ok) {
+                throw new Error(response.statusText);
+            }
+            return response.json();
+        })
+        .then(job => pollJob(job.poll_url, job.max_wait_seconds))
         .then(data => {
             showSuccessMessage();
             return data;
         })
-        .catch(() => {
-            showErrorMessage();
+        .catch((error) => {
+            if (error instanceof BusyError) {
+                showBusyMessage(error.retryAfter);
+            } else {
+                showErrorMessage();
+            }
             return null;
         });
 
 }
 
+class BusyError extends Error {
+    constructor(retryAfter) {
+        super("Busy");
+        this.retryAfter = retryAfter;
+    }
+}
+
+/**
+ * Wait until the analysis job is done, returns its predictionDTO. Gives up after max_wait_seconds
+ */
+async function pollJob(poll_url, max_wait_seconds) {
+    const deadline = Date.now() + (max_wait_seconds || job_default_max_wait) * 1000;
+    while (Date.now() < deadline) {
+        await new Promise(resolve => setTimeout(resolve, job_poll_interval));
+        const response = await fetch(poll_url);
+        const data = await response.json();
+        if (!response.ok || data.status === "failed") {
+            throw new Error(data.errors);
+        }
+        if (data.status === "done") {
+            return data;
+        }
+    }
+    throw new Error("Timed out");
+}
+
 function showSuccessMessage() {
     Swal.fire({
         icon: "success",
@@ -100,6 +141,15 @@ function showErrorMessage() {
     });
 }
 
+function showBusyMessage(retryAfter) {
+    Swal.fire({
+        icon: "warning",
+        title: "Hi ha massa imatges en cua",
+        text: retryAfter ? `Torna-ho a provar d'aquí ${retryAfter} segons.` : "Torna-ho a provar d'aquí una estona.",
+        showConfirmButton: true
+    });
+}
+
 /**
  * Hide loader
  */
@@ -113,7 +163,7 @@ function hideLoader(form) {
 */
 function showResult(form, predictionDTO) {
     var image = new Image();
-    image.src = `data:image/png;base64,${predictionDTO.img_predict_content}`;
+    image.src = predictionDTO.overlay_url;
     const canvas = form.find(canvasQuery).first();
     let submit = form.find(':submit');
     $(`#${p_show_result}`).remove();
@@ -1,49 +1,102 @@
-import random
+import os
 import subprocess
-from time import sleep
+import time
+from dataclasses import dataclass
 
-from selenium.common import ElementClickInterceptedException, WebDriverException
-from selenium.webdriver.chrome.options import Options
+from django.conf import settings
+from selenium.common import ElementClickInterceptedException
 from selenium.webdriver.common.by import By
-from seleniumwire import webdriver  # Import from seleniumwire
+from selenium.webdriver.support import expected_conditions
+from selenium.webdriver.support.ui import WebDriverWait
 
+from apps.webcam.browser import browser_pool
 
-def m3u8_from_clickable_element(url, clickable_element_xpath):
-    """ Downloads first m3u8 found, sleeps 20-35 secs for loading purposes"""
-    # Create a new instance of the Chrome driver
-    options = Options()
-    options.headless = True
+
+def remaining(deadline):
+    """ Seconds left until `deadline` (a time.monotonic() value), raises TimeoutError once it is reached. """
+    seconds = deadline - time.monotonic()
+    if seconds <= 0:
+        raise TimeoutError("Capture deadline reached.")
+    return seconds
+
+
+def m3u8_from_clickable_element(url, clickable_element_xpath, timeout=None):
+    """ Returns the first m3u8 request made by the page (after clicking on the element, if any).
+        Uses a warm driver from the browser pool and waits for the request itself instead of sleeping.
+        `timeout` bounds the whole call (waiting for a browser, loading, clicking and waiting for the request). """
+    deadline = time.monotonic() + (timeout or settings.BROWSER_WAIT_SECONDS)
+    pool = browser_pool()
+    web_driver = pool.acquire(timeout=remaining(deadline))
+    broken = True
+    try:
+        web_driver.set_page_load_timeout(remaining(deadline))
+        web_driver.get(url)
+        if clickable_element_xpath is not None:
+            element = WebDriverWait(web_driver, remaining(deadline)).until(
+                expected_conditions.element_to_be_clickable((By.XPATH, clickable_element_xpath))
+            )
+            try:
+                element.click()
+            except ElementClickInterceptedException:
+                web_driver.execute_script("arguments[0].click();", element)
+        api_request = web_driver.wait_for_request(r'\.m3u8', timeout=remaining(deadline))
+        broken = False
+        return [api_request]
+    finally:
+        pool.release(web_driver, broken=broken)
+
+
+@dataclass
+class CaptureResult:
+    """ Outcome of an ffmpeg capture. """
+    command: list
+    returncode: int | None     # None if ffmpeg was killed after the timeout
+    duration: float
+    video_bytes: int
+    image_bytes: int
+    stderr: str
+
+    @property
+    def ok(self):
+        return self.returncode == 0 and self.image_bytes > 0
+
+
+class CaptureError(Exception):
+    def __init__(self, result: CaptureResult):
+        self.result = result
+        super().__init__(f"ffmpeg exited with {result.returncode} after {result.duration:.1f}s: {result.stderr.strip()[-500:]}")
+
+
+def video_and_image_from_m3u8(stream_url, seconds, video_file_path, image_file_path, timeout=None) -> CaptureResult:
+    """ Records `seconds` of the stream into `video_file_path` and grabs a frame (at `seconds / 2`) into
+        `image_file_path` with a single ffmpeg run, so the stream is only opened and decoded once.
+        If `video_file_path` is None, no video is written and ffmpeg stops at the first decodable keyframe instead. """
+    command = ['ffmpeg', '-y', '-nostdin', '-loglevel', 'error']
+    if not video_file_path:
+        command += ['-skip_frame', 'nokey']     # Do not decode anything but keyframes
+    command += ['-i', stream_url]
+    if video_file_path:
+        # Output 1: the video, stream copy (no re-encoding)
+        command += ['-t', str(seconds), '-c', 'copy', '-f', 'mp4', video_file_path]
+        # Output 2: the frame at the middle of the video
+        command += ['-ss', str(seconds / 2)]
+    command += ['-map', '0:v:0', '-an', '-frames:v', '1', '-c:v', 'mjpeg', '-f', 'image2', image_file_path]
+
+    start = time.monotonic()
     try:
-        web_driver = webdriver.Chrome("/usr/bin/chromedriver", options=options)    # Ubuntu
-    except (WebDriverException, TypeError):
-        web_driver = webdriver.Chrome(options=options)  # MacOS
-    web_driver.get(url)
-    sleep(random.randint(5, 10))    # Wait until it is fully loaded
-    if clickable_element_xpath is not None:
-        element = web_driver.find_element(By.XPATH, clickable_element_xpath)
-        try:
-            element.click()
-        except ElementClickInterceptedException:
-            web_driver.execute_script("arguments[0].click();", element)
-    sleep(random.randint(20, 20))   # Wait until ad is gone
-    # Save all api-related requests
-    api_requests = [r for r in web_driver.requests
-                    if '.m3u8' in r.url and r.response]
-    return api_requests
-
-
-def video_and_image_from_m3u8(stream_url, seconds, video_file_path, image_file_path):
-    # Download stream
-    subprocess.run(
-        f'ffmpeg -y -i "{stream_url}" -t {seconds} -c copy -f mp4 "{video_file_path}"',
-        shell=True,
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL,
+        completed = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=timeout)
+        returncode, stderr = completed.returncode, completed.stderr
+    except subprocess.TimeoutExpired as e:
+        returncode, stderr = None, (e.stderr or b'') + f'Timed out after {timeout}s.'.encode()
+    return CaptureResult(
+        command=command,
+        returncode=returncode,
+        duration=time.monotonic() - start,
+        video_bytes=_file_size(video_file_path),
+        image_bytes=_file_size(image_file_path),
+        stderr=stderr.decode(errors='replace'),
     )
-    # Capture image
-    subprocess.run(
-        f'ffmpeg -y -i "{video_file_path}" -vcodec mjpeg -vframes 1 -an -f rawvideo -ss {seconds / 2} "{image_file_path}"',
-        shell=True,
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL,
-    )
\ No newline at end of file
+
+
+def _file_size(path):
+    return os.path.getsize(path) if path and os.path.exists(path) else 0
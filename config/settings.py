@@ -87,6 +87,19 @@ DATABASES = {
 }
 
 
+# Cache
+# Shared by web workers and download_and_process.py (see apps.core.page_cache)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+    }
+}
+
+PAGE_CACHE_SECONDS = 24 * 60 * 60  # Upper bound only: pages are invalidated at the end of every capture cycle
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -135,3 +148,67 @@ STATIC_ROOT = BASE_DIR / "static"
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+# Capture pipeline (download_and_process.py)
+CAPTURE_INTERVAL_SECONDS = 60 * 60  # How often the cron job runs (see deployment/templates/crontab.template)
+CAPTURE_WORKERS = 8     # Captures running at the same time
+CAPTURE_CONCURRENCY = {     # Per provider kind (see WebCam.provider_kind), on top of CAPTURE_WORKERS
+    'click': 2,     # Each one runs a headless Chrome
+    'youtube': 4,
+}
+CAPTURE_TIMEOUT_SECONDS = 120   # Per webcam: a capture running longer is given up
+INFERENCE_BATCH_SIZE = 8    # Captured snapshots predicted together
+DARK_FRAME_BRIGHTNESS = 35  # Mean luminance (0-255) below which frames are not predicted (night)
+UNCHANGED_FRAME_MAX_DISTANCE = 8    # Max differing bits (of 256) between frame hashes to reuse the previous prediction
+UNCHANGED_FRAME_MAX_AGE_SECONDS = 6 * 60 * 60  # Predictions older than this are never reused
+CROWD_STATISTICS_MIN_SAMPLES = 48   # Before this, WebCam.max_crowd_count is the running max (then, the p95)
+HTTP_TIMEOUT = (5, 30)  # (connect, read) seconds for provider requests
+HTTP_POOL_HOSTS = 20    # Hosts whose connections are kept alive
+BROWSER_POOL_SIZE = 2   # Warm headless Chromes for click providers (keep <= CAPTURE_CONCURRENCY['click'])
+BROWSER_MAX_USES = 20   # Captures before a driver is recycled
+BROWSER_WAIT_SECONDS = 40   # Max wait for the page, the clickable element and the .m3u8 request
+RESOLVED_STREAM_TTL_SECONDS = 3 * 60 * 60   # Reuse .m3u8 urls resolved from regex/click/youtube providers
+
+# Beach page history chart
+HISTORY_DAYS = 365  # Older snapshots are not shown
+HISTORY_RAW_DAYS = 30   # Older snapshots are shown as daily averages
+
+# Image analysis queue (apps.prediction.jobs, `manage.py run_analysis_worker`)
+ANALYSIS_QUEUE_MAX = 20     # Queued jobs; further uploads get a 429
+ANALYSIS_RATE_LIMIT = (5, 60)   # (uploads, seconds) allowed per client
+ANALYSIS_WORKER_POLL_SECONDS = 0.5
+ANALYSIS_JOB_TIMEOUT_SECONDS = 5 * 60   # Running jobs older than this are marked as failed (e.g. worker restarted)
+ANALYSIS_JOB_RETENTION_SECONDS = 60 * 60    # Finished jobs (and their images) are deleted afterwards
+ANALYSIS_MAX_IMAGE_SIDE = 1920  # Uploads are downscaled to fit, bounding CPU time and memory per job
+
+# Prediction overlays (density map over the frame), for snapshots and analyzed uploads
+PREDICTION_OVERLAY_FORMAT = 'jpeg'  # 'jpeg' or 'webp'
+PREDICTION_OVERLAY_QUALITY = 80
+PREDICTION_OVERLAY_MAX_SIDE = 1280  # Overlays are downscaled to fit (None: frame resolution)
+
+# Inference on high resolution frames (BayesianPredictor), bounds memory whatever the camera resolution
+INFERENCE_MODE = 'tiled'    # 'full' (whole frame at once), 'capped' (downscaled to INFERENCE_MAX_SIDE) or 'tiled'
+INFERENCE_MAX_SIDE = 1280
+INFERENCE_TILE_SIZE = 1024  # Pixels, multiple of 16. Smaller frames are not tiled
+INFERENCE_TILE_OVERLAP = 64 # Pixels, multiple of 16
+INFERENCE_BATCH_MAX_PIXELS = INFERENCE_TILE_SIZE ** 2   # Total pixels (w×h) of the frames or tiles of a forward pass, bounds its memory
+INFERENCE_BACKEND = 'eager'     # 'eager', 'torchscript' or 'int8', see predictions.classes.bayesian_stuff.backends
+INFERENCE_CHANNELS_LAST = False
+INFERENCE_INT8_MODEL_PATH = str(BASE_DIR / 'predictions/classes/bayesian_stuff/best_model.int8.pt')  # Built with `python -m predictions.benchmarks.backends --save-int8`
+
+# CPU budget of each kind of process, as (intra-op, inter-op) torch threads (see predictions.classes.CpuBudget)
+INFERENCE_THREADS = {
+    'batch': (4, 1),    # download_and_process.py (cron)
+    'worker': (2, 1),   # manage.py run_analysis_worker
+    'web': (1, 1),      # Each gunicorn worker (GUNICORN.NUM_WORKERS of them); they do not run the model themselves
+    'server': (4, 1),   # manage.py run_inference_server
+}
+
+# Inference server (`manage.py run_inference_server`): one model in memory, shared by the cron and the analysis worker
+INFERENCE_SERVER_SOCKET = str(BASE_DIR / 'inference.sock')  # None: every process loads its own model
+INFERENCE_SERVER_AUTHKEY = SECRET_KEY.encode()
+INFERENCE_SERVER_BATCH_WINDOW_SECONDS = 0.05    # Requests arriving within this window share a forward pass
+INFERENCE_SERVER_TIMEOUT_SECONDS = 300
+
+# Predictors of the capture cycle (download_and_process.py), the first one is the primary one (shown on the site)
+PREDICTOR_WORKERS = 1   # Predictors run concurrently on each batch of frames; keep within the 'batch' CPU budget
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# Bounds inference threads of every gunicorn worker (after the setup above: the budget comes from the settings)
+from predictions.classes.CpuBudget import cpu_budget  # noqa: E402
+cpu_budget.apply('web')
+print(cpu_budget.describe())
@@ -9,49 +9,32 @@ django.setup()
 
 from datetime import timedelta
 
-from django.conf import settings
 from django.utils import timezone
 
+from apps.core.page_cache import bump_data_generation
 from apps.prediction.models import Snapshot
+from apps.prediction.pipeline import CapturePipeline
 from apps.webcam.models import WebCam
 
-from predictions.classes.BayesianPredictor import BayesianPredictor
+from predictions.classes.CpuBudget import cpu_budget
+from predictions.classes.MaskCache import mask_cache
+from predictions.classes.ModelRegistry import registry
+from predictions.classes.PredictorFactory import get_predictor
 
-import ssl
-ssl._create_default_https_context = ssl._create_unverified_context  # To download pytorch model
-
-predictors = [BayesianPredictor()]
+predictors = [get_predictor()]
 
 
 def main():
-    for beachcam in WebCam.objects.order_by('-id').all():
-
-        print(f"Processing webcam {beachcam.beach_name}.")
-        snapshot = beachcam.create_snapshot()
-        print('  Snapshot created.')
-        
-        for predictor in predictors:
-            try:
-                mask_paths = [
-                    mask.path
-                    for mask in (beachcam.mask_beach, beachcam.mask_swimming)
-                    if mask
-                ]
-                predictionDTO = predictor.predict(snapshot.webcam_image.path, mask_paths)
-                print('  Prediction done.')
-                snapshot.predicted_crowd_count = predictionDTO.crowd_count
-                prediction_image_path = beachcam.relative_filepath(timestamp=snapshot.ts, subfolder='img/predictions/', extension='.jpg')
-                with open(os.path.join(settings.MEDIA_ROOT, prediction_image_path), 'wb') as f:
-                    f.write(predictionDTO.img_predict_content)
-                snapshot.predicted_image.name = prediction_image_path
-                snapshot.save()
-                beachcam.max_crowd_count = max(beachcam.max_crowd_count, predictionDTO.crowd_count)
-                beachcam.save()
-                print('  Prediction saved.')
-            except Exception as e:
-                # Handle any exception
-                print(f"download_and_process.py an error ocurred: {e}")
-                # TODO: make it NOT available.
+    cpu_budget.apply('batch')
+    print(cpu_budget.describe())
+    # Captures run concurrently and feed the (single) inference loop, see CapturePipeline
+    CapturePipeline(predictors).run(WebCam.objects.order_by('-id').all())
+    bump_data_generation()  # Invalidates cached pages
+
+    for metrics in registry.metrics():
+        print(f"Model {metrics['predictor']}: loaded {metrics['loads']} time(s) in {metrics['last_load_seconds']}s, reused {metrics['hits']} time(s).")
+    metrics = mask_cache.metrics()
+    print(f"Masks: rasterized {metrics['misses']} time(s), reused {metrics['hits']} time(s).")
 
     # print(f"Deleting old data.")
     # # Delete the outdated images of the file system from outdated predictions
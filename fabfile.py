@@ -66,7 +66,7 @@ templates = {
     "supervisor": {
         "local_path": "deployment/templates/supervisor.conf.template",
         "remote_path": f"/etc/supervisor/conf.d/{proj_name}.conf",
-        "reload_commands": [f"supervisorctl update gunicorn_{proj_name}"],
+        "reload_commands": [f"supervisorctl update gunicorn_{proj_name} analysis_worker_{proj_name} inference_server_{proj_name}"],
     },
     "gunicorn": {
         "local_path": "deployment/templates/gunicorn.conf.py.template",
@@ -241,7 +241,7 @@ def create(c, prepare_before_deploying=True):
     deploy(c, prepare=prepare_before_deploying)
 
     # Start gunicorn service
-    remote_sudo(c, f"supervisorctl start gunicorn_{proj_name}")
+    remote_sudo(c, f"supervisorctl start inference_server_{proj_name} gunicorn_{proj_name} analysis_worker_{proj_name}")
 
     # Bootstrap the DB
     addsuperuser(c)
@@ -282,7 +282,7 @@ def stop(c):
     Restart gunicorn worker processes for the project.
     """
     remote_shell(c, f"kill -HUP `cat {proj_path}/gunicorn.pid`", warn=True)
-    remote_sudo(c, f"supervisorctl stop gunicorn_{proj_name} celerybeat_{proj_name} celeryworker_{proj_name}", warn=True)
+    remote_sudo(c, f"supervisorctl stop gunicorn_{proj_name} analysis_worker_{proj_name} inference_server_{proj_name} celerybeat_{proj_name} celeryworker_{proj_name}", warn=True)
 
 
 @task(hosts=hosts)
@@ -294,7 +294,7 @@ def restart(c):
     print_task_header('restart')
     remote_shell(c, f"kill -HUP `cat {proj_path}/gunicorn.pid`", warn=True)
     remote_sudo(c, "supervisorctl reread", warn=True)
-    remote_sudo(c, f"supervisorctl restart gunicorn_{proj_name}", warn=True)
+    remote_sudo(c, f"supervisorctl restart inference_server_{proj_name} gunicorn_{proj_name} analysis_worker_{proj_name}", warn=True)
 
 
 @task(hosts=hosts)
@@ -1,16 +1,18 @@
 from dataclasses import dataclass
 from datetime import datetime
-import base64
 
 @dataclass
 class PredictionDTO:
     crowd_count: int
     img_predict_content: bytes
     time_stamp: datetime
+    img_predict_format: str = 'jpeg'   # Encoding of img_predict_content, also used as the file extension
+    region_counts: dict = None  # Crowd count per masked region, when masks are given per region
 
     def to_dict(self):
+        """ The image is not included: it is served on its own (binary, cacheable). """
         return {
             'crowd_count': self.crowd_count,
-            'img_predict_content': base64.b64encode(self.img_predict_content).decode('utf-8'),
+            'region_counts': self.region_counts,
             'time_stamp': self.time_stamp.isoformat() 
-        }
\ No newline at end of file
+        }
@@ -1,34 +1,31 @@
 from predictions.interfaces.PredictorInterface import PredictorInterface
 from predictions.DTO.PredictionDTO import PredictionDTO
 from django.conf import settings
-from django.utils import timezone
 from django import forms
-from PIL import Image
-import os
+from PIL import Image, ImageOps
 import logging
 logger = logging.getLogger(__name__)
 
 class CustomerPredict:
-    
+
     def handle(self, image: forms.ImageField, predictor: PredictorInterface) -> None|PredictionDTO:
-        
-        #save customer image
-        image_path = self.getImagePath(image)
-        image_class = Image.open(image)
-        image_class.save(image_path)
-        
+
         predictionDTO = None
         try:
-            predictionDTO = predictor.predict(image_path)
-        
+            # Decoded once in memory, the customer image never touches the disk
+            image_class = self.loadImage(image)
+            predictionDTO = predictor.predict(image_class)
+
         except Exception as e:
             logger.error(f"CustomerPredict::handle, error: {e}")
-            
-        #delete customer image
-        if os.path.exists(image_path):
-            os.remove(image_path)
-        
+
         return predictionDTO
-    
-    def getImagePath(self, image: forms.ImageField):
-        return settings.MEDIA_ROOT / f'{self.__class__.__name__}_{timezone.now().strftime("%Y%m%d%H%M%S")}.{image.image.format.lower()}'
\ No newline at end of file
+
+    def loadImage(self, image: forms.ImageField) -> Image.Image:
+        """ Returns the RGB image, upright and downscaled to ANALYSIS_MAX_IMAGE_SIDE (bounds the inference cost). """
+        max_side = settings.ANALYSIS_MAX_IMAGE_SIDE
+        with Image.open(image) as image_class:
+            image_class.draft('RGB', (max_side, max_side))    # JPEG: decode straight at a reduced scale
+            image_class = ImageOps.exif_transpose(image_class).convert('RGB')
+        image_class.thumbnail((max_side, max_side), Image.BILINEAR)
+        return image_class
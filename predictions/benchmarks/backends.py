@@ -0,0 +1,108 @@
+""" Accuracy vs latency of the inference backends, compared with the eager float32 model on stored snapshots.
+
+    python -m predictions.benchmarks.backends [--snapshots N] [--calibration N] [--save-int8 PATH] [--images PATH ...]
+
+The latest `--snapshots` predicted snapshots (or `--images`) are evaluated with BayesianPredictor as configured
+(INFERENCE_MODE, tiles...), only the backend changes. With `--save-int8`, the int8 model is first calibrated on the
+`--calibration` snapshots preceding them and saved (set INFERENCE_INT8_MODEL_PATH to use it); otherwise the int8 model
+at INFERENCE_INT8_MODEL_PATH is evaluated, if it exists.
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+import django
+django.setup()
+
+import numpy as np
+from django.conf import settings
+
+from apps.prediction.models import Snapshot
+from predictions.classes.BayesianPredictor import BayesianPredictor
+from predictions.classes.bayesian_stuff import backends
+
+CONFIGURATIONS = [
+    ('eager', False),
+    ('eager', True),
+    ('torchscript', False),
+    ('torchscript', True),
+    ('int8', False),
+    ('int8', True),
+]
+
+
+def snapshot_images(count, offset=0):
+    """ Paths of stored frames of predicted snapshots, latest first. """
+    snapshots = (Snapshot.objects
+                 .filter(inference=Snapshot.INFERENCE_RUN)
+                 .exclude(webcam_image='')
+                 .exclude(webcam_image__isnull=True)
+                 .order_by('-ts'))
+    paths = (snapshot.webcam_image.path for snapshot in snapshots.iterator())
+    paths = [path for path in paths if os.path.exists(path)]
+    return paths[offset:offset + count]
+
+
+def save_int8(path, image_paths):
+    predictor = BayesianPredictor()
+    predictor.backend, predictor.channels_last = 'eager', False
+    predictor.prepareModel()
+    calibration_inputs = []
+    for image_path in image_paths:
+        image = predictor.loadImage(image_path)
+        tile = image.crop((0, 0, min(image.width, predictor.tile_size), min(image.height, predictor.tile_size)))
+        calibration_inputs.append(predictor.processImage(tile))
+    backends.quantize(predictor.model, calibration_inputs).save(path)
+    print(f'int8 model calibrated on {len(image_paths)} frames, saved to {path}')
+
+
+def evaluate(backend, channels_last, images, int8_path):
+    """ Returns (crowd counts, seconds per image). """
+    predictor = BayesianPredictor()
+    predictor.backend, predictor.channels_last, predictor.int8_model_path = backend, channels_last, int8_path
+    predictor.prepareModel()
+    predictor.computeDensityMaps(images[:1])  # Warm up
+    counts, start = [], time.perf_counter()
+    for image in images:
+        counts.append(float(predictor.computeDensityMaps([image])[0].sum()))
+    return np.array(counts), (time.perf_counter() - start) / len(images)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--snapshots', type=int, default=20)
+    parser.add_argument('--calibration', type=int, default=20)
+    parser.add_argument('--save-int8', metavar='PATH')
+    parser.add_argument('--images', nargs='*', help="Evaluate these frames instead of stored snapshots")
+    args = parser.parse_args()
+
+    image_paths = args.images or snapshot_images(args.snapshots)
+    if not image_paths:
+        parser.error("No stored snapshot frame found, pass --images.")
+    if args.save_int8:
+        calibration_paths = snapshot_images(args.calibration, offset=args.snapshots) if not args.images else image_paths
+        save_int8(args.save_int8, calibration_paths or image_paths)
+    int8_path = args.save_int8 or settings.INFERENCE_INT8_MODEL_PATH
+
+    predictor = BayesianPredictor()
+    images = [predictor.loadImage(image_path) for image_path in image_paths]
+    print(f'{len(images)} frames, inference mode {predictor.inference_mode!r}')
+
+    reference, reference_seconds = None, None
+    for backend, channels_last in CONFIGURATIONS:
+        if backend == 'int8' and not os.path.exists(int8_path):
+            print(f'  int8 skipped: {int8_path} does not exist (see --save-int8)')
+            break
+        counts, seconds = evaluate(backend, channels_last, images, int8_path)
+        if reference is None:
+            reference, reference_seconds = counts, seconds
+        errors = np.abs(counts - reference)
+        relative_errors = errors / np.maximum(reference, 1)
+        print(f'  {backend + (", channels last" if channels_last else ""):<26}'
+              f' {seconds * 1000:8.1f} ms/frame  x{reference_seconds / seconds:4.2f}'
+              f'  count MAE {errors.mean():7.2f}  max error {errors.max():7.2f}  mean relative error {relative_errors.mean():6.2%}')
+
+
+if __name__ == '__main__':
+    main()
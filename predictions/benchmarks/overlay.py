@@ -0,0 +1,78 @@
+""" Per-image render time of prediction overlays.
+
+    python -m predictions.benchmarks.overlay [image ...] [--repeat N] [--max-side PX] [--format jpeg|webp|png]
+
+Without images, a random 1920x1080 frame is used. The density map is random, at the model's output scale (1/8).
+If matplotlib is installed, the former renderer (matplotlib 'jet', RGBA composite at full resolution) is timed too.
+"""
+import argparse
+import io
+import time
+
+import numpy as np
+from PIL import Image
+
+from predictions.classes.OverlayRenderer import OverlayRenderer
+
+
+def legacy_render(background_image, density_map, alpha_channel=75, density_map_intensity=250, format='png', quality=80):
+    import matplotlib.pyplot as plt
+    density_map_normalized = density_map / (np.max(density_map) + 1e-8)
+    density_map_colored = plt.cm.jet(density_map_normalized)[:, :, :3]
+    density_map_rgba = np.zeros((density_map.shape[0], density_map.shape[1], 4), dtype=np.uint8)
+    density_map_rgba[..., :3] = density_map_colored * 255
+    alpha = density_map_normalized * density_map_intensity
+    alpha[alpha > alpha_channel] = alpha_channel
+    density_map_rgba[..., 3] = alpha
+    density_map_image = Image.fromarray(density_map_rgba).resize(background_image.size, Image.BILINEAR)
+    combined_image = Image.alpha_composite(background_image.convert('RGBA'), density_map_image)
+    if format != 'png':
+        combined_image = combined_image.convert('RGB')
+    buffer = io.BytesIO()
+    combined_image.save(buffer, format=format, quality=quality)
+    return buffer.getvalue()
+
+
+def timeit(render, repeat):
+    render()    # Warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        size = len(render())
+    return (time.perf_counter() - start) / repeat * 1000, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('images', nargs='*')
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--max-side', type=int, default=1280)
+    parser.add_argument('--format', default='jpeg')
+    parser.add_argument('--quality', type=int, default=80)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.images:
+        images = [(path, Image.open(path).convert('RGB')) for path in args.images]
+    else:
+        images = [('random 1920x1080', Image.fromarray(rng.integers(0, 256, (1080, 1920, 3), dtype=np.uint8)))]
+
+    renderers = [
+        ('OverlayRenderer, full size', OverlayRenderer(format=args.format, quality=args.quality)),
+        (f'OverlayRenderer, max side {args.max_side}', OverlayRenderer(max_side=args.max_side, format=args.format, quality=args.quality)),
+    ]
+    for name, image in images:
+        density_map = rng.gamma(0.5, 0.01, (image.height // 8, image.width // 8)).astype(np.float32)
+        print(f'{name} ({image.width}x{image.height}):')
+        try:
+            for format in ('png', args.format):
+                ms, size = timeit(lambda: legacy_render(image, density_map, format=format, quality=args.quality), args.repeat)
+                print(f'  {"matplotlib, " + format:<40} {ms:8.1f} ms  {size / 1024:8.1f} KiB')
+        except ImportError:
+            print('  (matplotlib is not installed, former renderer skipped)')
+        for renderer_name, renderer in renderers:
+            ms, size = timeit(lambda: renderer.render_bytes(image, density_map), args.repeat)
+            print(f'  {renderer_name + ", " + args.format:<40} {ms:8.1f} ms  {size / 1024:8.1f} KiB')
+
+
+if __name__ == '__main__':
+    main()
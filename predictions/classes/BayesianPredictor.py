@@ -1,95 +1,232 @@
-import io
+import math
 import os
+from collections import defaultdict
 
-import matplotlib.pyplot as plt
 import numpy as np
 import torch
 from PIL import Image
+from django.conf import settings
 from django.utils import timezone
 from torchvision import transforms
 
 from predictions.DTO.PredictionDTO import PredictionDTO
-from predictions.classes.bayesian_stuff.vgg import vgg19
+from predictions.classes.MaskCache import mask_cache
+from predictions.classes.ModelRegistry import registry
+from predictions.classes.OverlayRenderer import OverlayRenderer
+from predictions.classes.bayesian_stuff import backends
+from predictions.classes.bayesian_stuff.vgg import load_bundle
 from predictions.interfaces.PredictorInterface import PredictorInterface
 
 
 class BayesianPredictor(PredictorInterface):
+    name = 'bayesian'
     transformer = None
     model = None
     device = "cpu"
     weigth_path = "./predictions/classes/bayesian_stuff/best_model.pth"
     alpha_channel = 75
     density_map_intensity = 250
+    max_batch_size = 8
+    max_batch_pixels = settings.INFERENCE_BATCH_MAX_PIXELS
+    counted_regions = ('beach', 'swimming')    # Regions of a {region: mask path} dict that make up the crowd count
+    backend = settings.INFERENCE_BACKEND
+    channels_last = settings.INFERENCE_CHANNELS_LAST
+    int8_model_path = settings.INFERENCE_INT8_MODEL_PATH
+    inference_mode = settings.INFERENCE_MODE
+    max_input_side = settings.INFERENCE_MAX_SIDE
+    tile_size = settings.INFERENCE_TILE_SIZE
+    tile_overlap = settings.INFERENCE_TILE_OVERLAP
+    overlay_format = settings.PREDICTION_OVERLAY_FORMAT
+    overlay_quality = settings.PREDICTION_OVERLAY_QUALITY
+    overlay_max_side = settings.PREDICTION_OVERLAY_MAX_SIDE
     
     def __init__(self):
         self.transformer = transforms.Compose([
                 transforms.ToTensor(),
                 transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
             ])    
+        self.overlay_renderer = OverlayRenderer(
+            alpha_channel=self.alpha_channel,
+            density_map_intensity=self.density_map_intensity,
+            max_side=self.overlay_max_side,
+            format=self.overlay_format,
+            quality=self.overlay_quality,
+        )
     
-    def predict(self, image_path: str, mask_paths = []) -> PredictionDTO:
+    def predict(self, image, mask_paths = []) -> PredictionDTO:
+        return self.predict_batch([image], [mask_paths])[0]
+
+    def predict_batch(self, images: list, mask_paths_list: list = None) -> list:
         self.prepareModel()
-        inputs = self.processImage(image_path)
+        mask_paths_list = mask_paths_list or [[] for _ in images]
+        images = [self.loadImage(image) for image in images]   # Decoded once, for inference and for the overlay
+        density_maps = self.computeDensityMaps(images)
+        return [
+            self.buildPrediction(image, density_map, mask_paths)
+            for image, density_map, mask_paths in zip(images, density_maps, mask_paths_list)
+        ]
+
+    def computeDensityMaps(self, images: list) -> list:
+        """ Runs forward passes over buckets of same-resolution inputs, split along `batchLength`.
+            Density maps always have the shape of the full resolution output (see `outputShape`), whatever the mode. """
+        density_maps = [None] * len(images)
+        buckets = defaultdict(list)
+        tiled = []
+        for idx, image in enumerate(images):
+            if self.inference_mode == 'tiled' and max(image.size) > self.tile_size:
+                tiled.append(idx)
+            else:
+                buckets[self.inputSize(image.size)].append(idx)
 
         with torch.set_grad_enabled(False):
-            outputs = self.model(inputs)
-            density_map = outputs.squeeze().cpu().numpy()
-        
+            for input_size, indices in buckets.items():
+                batch_length = self.batchLength(input_size)
+                for start in range(0, len(indices), batch_length):
+                    chunk = indices[start:start + batch_length]
+                    inputs = torch.cat([self.processImage(self.resizeImage(images[idx], input_size)) for idx in chunk])
+                    outputs = self.runModel(inputs)
+                    for idx, output in zip(chunk, outputs):
+                        density_maps[idx] = self.rescaleDensityMap(output, self.outputShape(images[idx].size))
+            for idx in tiled:
+                density_maps[idx] = self.computeTiledDensityMap(images[idx])
+        return density_maps
+
+    def batchLength(self, size: tuple) -> int:
+        """ Inputs of `size` per forward pass: at most `max_batch_size`, and `max_batch_pixels` in total (memory grows
+            with the pixels of a pass, not the number of images), but always at least one. """
+        width, height = size
+        return max(1, min(self.max_batch_size, self.max_batch_pixels // (width * height)))
+
+    def computeTiledDensityMap(self, image: Image.Image) -> np.ndarray:
+        """ Splits the image into overlapping tiles of at most `tile_size` (batched along `batchLength`) and stitches
+            their density maps back, averaged with weights that fade out towards the tile borders where tiles overlap. """
+        width, height = image.size
+        tile_width, x_starts = self.tileLayout(width)
+        tile_height, y_starts = self.tileLayout(height)
+        boxes = [(x, y, x + tile_width, y + tile_height) for y in y_starts for x in x_starts]
+
+        density_map = np.zeros(self.outputShape(image.size), dtype=np.float32)
+        weights = np.zeros_like(density_map)
+        window = np.outer(self.tileWindow(tile_height // 8), self.tileWindow(tile_width // 8))
+        batch_length = self.batchLength((tile_width, tile_height))
+        for start in range(0, len(boxes), batch_length):
+            chunk = boxes[start:start + batch_length]
+            outputs = self.runModel(torch.cat([self.processImage(image.crop(box)) for box in chunk]))
+            for (x, y, _, _), output in zip(chunk, outputs):
+                rows, columns = slice(y // 8, y // 8 + window.shape[0]), slice(x // 8, x // 8 + window.shape[1])
+                density_map[rows, columns] += output.squeeze(0).cpu().numpy() * window
+                weights[rows, columns] += window
+        return density_map / np.maximum(weights, 1e-8)
+
+    def tileLayout(self, length: int) -> tuple:
+        """ (tile length, tile offsets) along one side: the fewest tiles of at most `tile_size` overlapping by
+            `tile_overlap`, shrunk to just cover the side and evenly spread, so that no pixel is run more than needed.
+            Lengths and offsets are multiples of 16 (the model's stride) so that tile outputs align. """
+        stride = max(16, (self.tile_size - self.tile_overlap) // 16 * 16)
+        count = max(1, math.ceil((length - self.tile_size) / stride) + 1)
+        tile = math.ceil((length + (count - 1) * self.tile_overlap) / count / 16) * 16
+        tile = min(tile, length // 16 * 16)
+        last = (length - tile) // 16 * 16
+        starts = [round(last * i / max(1, count - 1) / 16) * 16 for i in range(count)]
+        return tile, starts
+
+    def tileWindow(self, size: int) -> np.ndarray:
+        """ Stitching weights along one side of a tile output: 1 in the middle, linear ramps over the overlap. """
+        ramp = max(1, self.tile_overlap // 8)
+        position = np.arange(size, dtype=np.float32)
+        return np.minimum(1, np.minimum(position + 1, size - position) / (ramp + 1))
+
+    def inputSize(self, size: tuple) -> tuple:
+        """ Size fed to the model: the image size, or scaled down to `max_input_side` in 'capped' mode. """
+        width, height = size
+        if self.inference_mode != 'capped' or max(width, height) <= self.max_input_side:
+            return size
+        scale = self.max_input_side / max(width, height)
+        return max(16, round(width * scale)), max(16, round(height * scale))
+
+    def outputShape(self, size: tuple) -> tuple:
+        """ (height, width) of the density map of a full resolution image: 1/16 by VGG pooling, then upsampled x2. """
+        width, height = size
+        return height // 16 * 2, width // 16 * 2
+
+    def resizeImage(self, image: Image.Image, size: tuple) -> Image.Image:
+        return image if image.size == size else image.resize(size, Image.BILINEAR, reducing_gap=2.0)
+
+    def rescaleDensityMap(self, output, shape: tuple) -> np.ndarray:
+        """ Resizes a (1, h, w) model output to `shape`, keeping its integral (the crowd count). """
+        if tuple(output.shape[-2:]) == tuple(shape):
+            return output.squeeze(0).cpu().numpy()
+        resized = torch.nn.functional.interpolate(output.unsqueeze(0), size=shape, mode='bilinear', align_corners=False)
+        resized *= output.sum() / resized.sum().clamp(min=1e-8)
+        return resized.squeeze(0).squeeze(0).cpu().numpy()
+
+    def buildPrediction(self, image: Image.Image, density_map: np, mask_paths = []) -> PredictionDTO:
+        region_counts = None
         if(mask_paths):
-            density_map = self.applyMasks(mask_paths, density_map)
+            if isinstance(mask_paths, dict):
+                region_counts = self.regionCounts(mask_paths, density_map)
+                mask_paths = [mask_paths[region] for region in self.counted_regions if region in mask_paths]
+            if mask_paths:
+                density_map = self.applyMasks(mask_paths, density_map)
             
-        merged_image = self.mergeDensityMapWithImage(image_path, density_map)
+        merged_image = self.mergeDensityMapWithImage(image, density_map)
         
         return PredictionDTO(
             crowd_count= round(np.sum(density_map)),
+            region_counts=region_counts,
             time_stamp= timezone.now(),
-            img_predict_content=merged_image
+            img_predict_content=merged_image,
+            img_predict_format=self.overlay_format,
         )
         
     def prepareModel(self):
-        self.model = vgg19()
-        device = torch.device(self.device)
-        self.model.to(device)
-        self.model.load_state_dict(torch.load(os.path.abspath(self.weigth_path), device))
-
-    def processImage(self, image_path: str):
-        img = Image.open(image_path).convert('RGB')
-        img = self.transformer(img)
+        """ Fetches the warmed model from the process-wide registry, loading it only once per weights file. """
+        weights_path = self.int8_model_path if self.backend == 'int8' else self.weigth_path
+        name = f'{self.__class__.__name__}:{self.backend}' + (':channels_last' if self.channels_last else '')
+        self.model = registry.get(name, weights_path, self.device, self.loadModel)
+
+    def loadModel(self):
+        """ Builds the model straight from the fine-tuned weights (no ImageNet download, no network access). """
+        model = None
+        if self.backend != 'int8':
+            model = load_bundle(os.path.abspath(self.weigth_path), torch.device(self.device))
+            model.eval()
+        return backends.build(model, self.backend, self.channels_last, self.int8_model_path)
+
+    def runModel(self, inputs):
+        if self.channels_last:
+            inputs = inputs.contiguous(memory_format=torch.channels_last)
+        return self.model(inputs)
+
+    def loadImage(self, image) -> Image.Image:
+        """ Accepts a file path (or file object), a PIL image or an HxWx3 uint8 array. Returns an RGB PIL image. """
+        if isinstance(image, Image.Image):
+            return image if image.mode == 'RGB' else image.convert('RGB')
+        if isinstance(image, np.ndarray):
+            return Image.fromarray(image).convert('RGB')
+        with Image.open(image) as img:
+            return img.convert('RGB')
+
+    def processImage(self, image: Image.Image):
+        img = self.transformer(image)
         img = img.unsqueeze(0)
         return img.to(self.device)
     
     def applyMasks(self, mask_paths: list, density_map: np):
-        combined_mask = np.zeros_like(density_map)
-        
-        for mask_path in mask_paths:
-            if not os.path.exists(mask_path):
-                continue
-            mask_image = Image.open(mask_path).convert('L')
-            mask_image = mask_image.resize((density_map.shape[1], density_map.shape[0]), Image.BILINEAR)
-            np_mask = np.array(mask_image) < 128 #dark areas -> 1
-            combined_mask = combined_mask + np_mask
-        
-        combined_mask[combined_mask > 0] = 1
-        return np.multiply(density_map, combined_mask)
+        """ Keeps the density inside any of the masks (the rasterized masks are cached until their files change). """
+        combined_mask = mask_cache.get(mask_paths, density_map.shape)
+        if combined_mask is None:   # No mask file exists
+            return np.zeros_like(density_map)
+        return np.where(combined_mask, density_map, 0)
 
-    def mergeDensityMapWithImage(self, image_path: str, density_map: np):
-        background_image = Image.open(image_path).convert('RGB')
+    def regionCounts(self, mask_paths: dict, density_map: np) -> dict:
+        """ Crowd count inside each region's mask, e.g. {'beach': 120, 'swimming': 15, 'boats': 3}. """
+        region_counts = {}
+        for region, mask_path in mask_paths.items():
+            mask = mask_cache.get([mask_path], density_map.shape)
+            if mask is not None:
+                region_counts[region] = round(float(density_map[mask].sum()))
+        return region_counts
 
-        density_map_normalized = density_map / (np.max(density_map) + 1e-8)
-        
-        density_map_colored = plt.cm.jet(density_map_normalized)[:, :, :3]
-        density_map_rgba = np.zeros((density_map.shape[0], density_map.shape[1], 4), dtype=np.uint8)
-        density_map_rgba[..., :3] = density_map_colored * 255
-        
-        alpha_channel = density_map_normalized * self.density_map_intensity
-        alpha_channel[alpha_channel > self.alpha_channel] = self.alpha_channel
-        density_map_rgba[..., 3] = alpha_channel
-
-        density_map_image = Image.fromarray(density_map_rgba)
-        width, height = background_image.size
-        density_map_image = density_map_image.resize((width, height), Image.BILINEAR)
-
-        combined_image = Image.alpha_composite(background_image.convert('RGBA'), density_map_image)
-        buffer = io.BytesIO()
-        combined_image.save(buffer, format='PNG')
-        return buffer.getvalue()
+    def mergeDensityMapWithImage(self, background_image: Image.Image, density_map: np):
+        return self.overlay_renderer.render_bytes(background_image, density_map)
@@ -0,0 +1,57 @@
+import os
+import sys
+
+from django.conf import settings
+
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS')
+
+
+class CpuBudget:
+    """ Threads each kind of process may use for inference, so that processes sharing the machine do not oversubscribe it
+    (by default, torch uses every core in every process).
+
+    `threads` maps a role ('batch', 'worker', 'web'...) to its (intra-op, inter-op) torch thread counts.
+    """
+
+    def __init__(self, threads: dict):
+        self.threads = threads
+        self.role = None
+
+    def apply(self, role: str) -> dict:
+        """ Applies the role's budget to this process and returns the effective settings (see `report`).
+            Call it at startup: torch only accepts the inter-op thread count before its first parallel work. """
+        intra_op, inter_op = self.threads[role]
+        intra_op = min(intra_op, os.cpu_count() or intra_op)   # Never more threads than cores
+        self.role = role
+        # Also bounds the native libraries of a torch imported later on, and child processes
+        for name in THREAD_ENV_VARS:
+            os.environ[name] = str(intra_op)
+        torch = sys.modules.get('torch')  # Not imported on purpose: processes that do not predict do not need it
+        if torch is not None:
+            torch.set_num_threads(intra_op)
+            try:
+                torch.set_num_interop_threads(inter_op)
+            except RuntimeError:    # Too late, already set or used
+                pass
+        return self.report()
+
+    def report(self) -> dict:
+        torch = sys.modules.get('torch')
+        return {
+            'role': self.role,
+            'cpus': os.cpu_count(),
+            'intra_op_threads': torch.get_num_threads() if torch else None,
+            'inter_op_threads': torch.get_num_interop_threads() if torch else None,
+            **{name: os.environ.get(name) for name in THREAD_ENV_VARS},
+        }
+
+    def describe(self) -> str:
+        report = self.report()
+        if report['intra_op_threads'] is None:
+            torch_threads = f"torch not loaded, {report['OMP_NUM_THREADS']} thread(s) once it is"
+        else:
+            torch_threads = f"torch intra-op {report['intra_op_threads']}, inter-op {report['inter_op_threads']} thread(s)"
+        return f"CPU budget ({report['role']}): {torch_threads}, {report['cpus']} CPUs."
+
+
+cpu_budget = CpuBudget(settings.INFERENCE_THREADS)
@@ -0,0 +1,113 @@
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from multiprocessing.connection import Listener
+
+from predictions.interfaces.PredictorInterface import PredictorInterface
+
+
+@dataclass
+class InferenceRequest:
+    images: list
+    mask_paths_list: list
+    done: threading.Event = field(default_factory=threading.Event)
+    response: tuple = None
+
+
+class InferenceServer:
+    """ Serves a predictor (a single model in memory) to the other processes of the host over a Unix socket.
+
+    Every client connection sends ('predict_batch', images, mask_paths_list) and receives ('ok', [PredictionDTO, ...])
+    or ('error', message); see RemotePredictor. Requests arriving within `batch_window` seconds of each other are run
+    together, up to `max_batch_size` images, so that concurrent clients share forward passes.
+    """
+
+    def __init__(self, predictor: PredictorInterface, address: str, authkey: bytes, batch_window=0.05, max_batch_size=8):
+        self.predictor = predictor
+        self.address = address
+        self.authkey = authkey
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.requests = queue.Queue()
+        self.served = 0
+        self.batches = 0
+
+    def serve_forever(self):
+        if os.path.exists(self.address):
+            os.remove(self.address)     # Left by a previous server
+        # A SIGTERM exits through the `with` below, whose listener removes the socket: clients of a stopped server
+        # then load the model themselves instead of trying a dead socket
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        with Listener(self.address, family='AF_UNIX', authkey=self.authkey) as listener:
+            os.chmod(self.address, 0o660)
+            # Listening before the model is loaded: clients started at the same time (see fabfile) queue their requests
+            # instead of finding no socket and loading a model of their own
+            threading.Thread(target=self.inference_loop, daemon=True).start()
+            while True:
+                try:
+                    connection = listener.accept()
+                except Exception as e:  # E.g. a client with a wrong authkey
+                    print(f"InferenceServer: connection refused: {e}")
+                    continue
+                threading.Thread(target=self.handle, args=(connection,), daemon=True).start()
+
+    def handle(self, connection):
+        with connection:
+            try:
+                command, images, mask_paths_list = connection.recv()
+                if command != 'predict_batch':
+                    raise ValueError(f"Unknown command {command!r}")
+                request = InferenceRequest(images, mask_paths_list or [[] for _ in images])
+                self.requests.put(request)
+                request.done.wait()
+                connection.send(request.response)
+            except (EOFError, OSError):     # Client gone
+                pass
+            except Exception as e:
+                connection.send(('error', f"{e.__class__.__name__}: {e}"))
+
+    def inference_loop(self):
+        try:
+            if hasattr(self.predictor, 'prepareModel'):
+                self.predictor.prepareModel()   # Warm up before the first batch
+        except Exception as e:  # Batches will report it to the clients
+            print(f"InferenceServer: warm up failed: {e}")
+        while True:
+            batch = [self.requests.get()]
+            size = len(batch[0].images)
+            deadline = time.monotonic() + self.batch_window
+            while size < self.max_batch_size:
+                try:
+                    request = self.requests.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                batch.append(request)
+                size += len(request.images)
+            self.run(batch)
+
+    def run(self, batch):
+        images = [image for request in batch for image in request.images]
+        mask_paths_list = [mask_paths for request in batch for mask_paths in request.mask_paths_list]
+        try:
+            predictionDTOs = self.predictor.predict_batch(images, mask_paths_list)
+        except Exception as e:
+            if len(batch) > 1:
+                for request in batch:   # Only the faulty request fails
+                    self.run([request])
+                return
+            predictionDTOs = None
+            error = ('error', f"{e.__class__.__name__}: {e}")
+        start = 0
+        for request in batch:
+            if predictionDTOs is None:
+                request.response = error
+            else:
+                request.response = ('ok', predictionDTOs[start:start + len(request.images)])
+            start += len(request.images)
+            request.done.set()
+        self.served += len(images)
+        self.batches += 1
@@ -0,0 +1,74 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+
+class MaskCache:
+    """ Process-wide cache of region masks, rasterized as boolean arrays at the density map resolution.
+
+    Entries are keyed by file path and shape, and are rebuilt when the file changes (mtime/size), e.g. when an admin
+    uploads a new mask. The least recently used entries are dropped beyond `max_entries`.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # (paths, shape) -> (stamps, mask)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, mask_paths, shape) -> np.ndarray | None:
+        """ Returns the union of the masks (dark areas are True) with the given (height, width), read-only.
+            Missing files are ignored; returns None when none of them exists. """
+        mask_paths = tuple(mask_paths)
+        stamps = tuple(self.stamp(path) for path in mask_paths)
+        if all(stamp is None for stamp in stamps):
+            return None
+        key = (mask_paths, tuple(shape))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == stamps:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        if len(mask_paths) == 1:
+            mask = self.rasterize(mask_paths[0], shape)
+        else:
+            # Each file is cached on its own too: regions are also combined in other ways (total vs per-region counts)
+            mask = np.logical_or.reduce([self.get([path], shape) for path, stamp in zip(mask_paths, stamps) if stamp])
+        mask.flags.writeable = False
+
+        with self._lock:
+            self._entries[key] = (stamps, mask)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return mask
+
+    def stamp(self, path):
+        try:
+            stat = os.stat(path)
+        except (OSError, TypeError):
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def rasterize(self, path, shape) -> np.ndarray:
+        with Image.open(path) as mask_image:
+            mask_image = mask_image.convert('L').resize((shape[1], shape[0]), Image.BILINEAR)
+        return np.asarray(mask_image) < 128    # dark areas -> True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+mask_cache = MaskCache()
@@ -0,0 +1,104 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ModelEntry:
+    model: Any
+    mtime_ns: int
+    size: int
+    sha256: str
+    load_seconds: float
+    loaded_at: float
+    loads: int = 1
+    hits: int = 0
+
+
+class ModelRegistry:
+    """ Process-wide cache of warmed models keyed by (predictor, weights file, device).
+
+    A model is reloaded only when its weights file changes: the file's mtime and size are checked on every access and,
+    when they differ, its sha256 is compared before paying for a full reload (e.g. a `touch` or a re-deploy of the
+    same checkpoint keeps the warmed model).
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(name: str, weights_path: str, device) -> tuple:
+        return name, os.path.abspath(weights_path), str(device)
+
+    @staticmethod
+    def file_hash(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def get(self, name: str, weights_path: str, device, loader: Callable[[], Any]):
+        """ Returns the cached model for the key, calling `loader()` only if missing or if the weights file changed. """
+        key = self.key(name, weights_path, device)
+        stat = os.stat(key[1])
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry.mtime_ns, entry.size) == (stat.st_mtime_ns, stat.st_size):
+                entry.hits += 1
+                return entry.model
+            sha256 = self.file_hash(key[1])
+            if entry is not None and entry.sha256 == sha256:
+                entry.mtime_ns, entry.size = stat.st_mtime_ns, stat.st_size
+                entry.hits += 1
+                return entry.model
+            start = time.perf_counter()
+            model = loader()
+            load_seconds = time.perf_counter() - start
+            self._entries[key] = ModelEntry(
+                model=model,
+                mtime_ns=stat.st_mtime_ns,
+                size=stat.st_size,
+                sha256=sha256,
+                load_seconds=load_seconds,
+                loaded_at=time.time(),
+                loads=entry.loads + 1 if entry is not None else 1,
+            )
+            logger.info(f"ModelRegistry: loaded {name} from {key[1]} on {key[2]} in {load_seconds:.2f}s.")
+            return model
+
+    def evict(self, name: str, weights_path: str, device):
+        with self._lock:
+            self._entries.pop(self.key(name, weights_path, device), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self) -> list[dict]:
+        """ Returns load-time and hit metrics for every cached model. """
+        with self._lock:
+            return [
+                {
+                    'predictor': name,
+                    'weights_path': weights_path,
+                    'device': device,
+                    'sha256': entry.sha256,
+                    'loads': entry.loads,
+                    'hits': entry.hits,
+                    'last_load_seconds': round(entry.load_seconds, 3),
+                    'loaded_at': entry.loaded_at,
+                }
+                for (name, weights_path, device), entry in self._entries.items()
+            ]
+
+
+# Shared by every predictor in the process (cron script, web workers).
+registry = ModelRegistry()
@@ -0,0 +1,67 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+
+def jet_lut() -> np.ndarray:
+    """ 256x3 uint8 table of matplotlib's 'jet' colormap (same segment data), without importing matplotlib. """
+    x = np.linspace(0, 1, 256)
+    segments = (
+        ((0, 0.35, 0.66, 0.89, 1), (0, 0, 1, 1, 0.5)),             # red
+        ((0, 0.125, 0.375, 0.64, 0.91, 1), (0, 0, 1, 1, 0, 0)),    # green
+        ((0, 0.11, 0.34, 0.65, 1), (0.5, 1, 1, 0, 0)),             # blue
+    )
+    return np.stack([np.interp(x, xp, fp) * 255 for xp, fp in segments], axis=1).astype(np.uint8)
+
+
+JET_LUT = jet_lut()
+
+
+class OverlayRenderer:
+    """ Draws a density map over its (already decoded) image and encodes the result. """
+
+    def __init__(self, alpha_channel=75, density_map_intensity=250, max_side=None, format='jpeg', quality=80):
+        self.alpha_channel = alpha_channel  # Max opacity of the density map, 0-255
+        self.density_map_intensity = density_map_intensity  # Opacity of the densest pixel, before the cap
+        self.max_side = max_side    # Output is downscaled to fit (None: image resolution)
+        self.format = format
+        self.quality = quality
+
+    def render(self, background_image: Image.Image, density_map: np.ndarray) -> Image.Image:
+        """ Returns a new RGB image; `background_image` is left untouched. """
+        colors, alpha = self.colorize(density_map)
+        size = self.output_size(background_image.size)
+        output = background_image if background_image.mode == 'RGB' else background_image.convert('RGB')
+        if size == output.size:
+            output = output.copy()
+        else:
+            output = output.resize(size, Image.BILINEAR, reducing_gap=2.0)
+        # The density map is 8 times smaller than the image: upscale it, then blend (out = bg * (1 - a) + colors * a)
+        colors = Image.fromarray(colors).resize(size, Image.BILINEAR)
+        alpha = Image.fromarray(alpha).resize(size, Image.BILINEAR)
+        output.paste(colors, (0, 0), alpha)
+        return output
+
+    def render_bytes(self, background_image: Image.Image, density_map: np.ndarray) -> bytes:
+        buffer = io.BytesIO()
+        self.render(background_image, density_map).save(buffer, format=self.format, quality=self.quality)
+        return buffer.getvalue()
+
+    def colorize(self, density_map: np.ndarray):
+        """ Returns (HxWx3 colors, HxW alpha), both uint8, for a density map normalized by its max. """
+        scaled = np.clip(density_map, 0, None, dtype=np.float32)
+        scaled *= 1 / (float(scaled.max()) + 1e-8)   # 0-1
+        alpha = np.multiply(scaled, self.density_map_intensity)
+        np.minimum(alpha, self.alpha_channel, out=alpha)
+        scaled *= 256   # LUT index
+        np.minimum(scaled, 255, out=scaled)
+        colors = JET_LUT[scaled.astype(np.uint8)]
+        return colors, alpha.astype(np.uint8)
+
+    def output_size(self, size):
+        width, height = size
+        if not self.max_side or max(width, height) <= self.max_side:
+            return size
+        scale = self.max_side / max(width, height)
+        return max(1, round(width * scale)), max(1, round(height * scale))
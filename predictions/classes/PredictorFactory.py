@@ -0,0 +1,20 @@
+from django.conf import settings
+
+from predictions.interfaces.PredictorInterface import PredictorInterface
+
+
+def get_predictor() -> PredictorInterface:
+    """ Returns a client of the inference server (`manage.py run_inference_server`) when it is enabled, otherwise a
+        predictor loading the model in this process. The client itself falls back to a local model, call by call,
+        while the server cannot be reached (e.g. it is still starting or it was stopped). """
+    address = settings.INFERENCE_SERVER_SOCKET
+    if address:
+        from predictions.classes.RemotePredictor import RemotePredictor
+        return RemotePredictor(address, settings.INFERENCE_SERVER_AUTHKEY, timeout=settings.INFERENCE_SERVER_TIMEOUT_SECONDS,
+                               fallback=get_local_predictor)
+    return get_local_predictor()
+
+
+def get_local_predictor() -> PredictorInterface:
+    from predictions.classes.BayesianPredictor import BayesianPredictor     # Imports torch
+    return BayesianPredictor()
@@ -0,0 +1,47 @@
+from multiprocessing.connection import Client
+
+import numpy as np
+from PIL import Image
+
+from predictions.DTO.PredictionDTO import PredictionDTO
+from predictions.interfaces.PredictorInterface import PredictorInterface
+
+
+class RemotePredictor(PredictorInterface):
+    """ Client of an InferenceServer: predicts without loading any model in this process.
+
+    While the server cannot be reached (not started yet, stopped, crashed), calls are run by a local predictor built
+    with `fallback` on first need; every call tries the server first again.
+    """
+
+    def __init__(self, address: str, authkey: bytes, timeout=300, name='bayesian', fallback=None):
+        self.name = name    # Of the predictor served (run_inference_server serves BayesianPredictor)
+        self.address = address
+        self.authkey = authkey
+        self.timeout = timeout
+        self.fallback = fallback
+        self.local_predictor = None
+
+    def predict(self, image, mask_paths = []) -> PredictionDTO:
+        return self.predict_batch([image], [mask_paths])[0]
+
+    def predict_batch(self, images, mask_paths_list = None) -> list[PredictionDTO]:
+        try:
+            connection = Client(self.address, family='AF_UNIX', authkey=self.authkey)
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            if self.fallback is None:
+                raise
+            if self.local_predictor is None:
+                print(f"Inference server not reachable ({self.address}: {e}), the model is loaded in this process.")
+                self.local_predictor = self.fallback()
+            return self.local_predictor.predict_batch(images, mask_paths_list)
+        # Paths are sent as is (the server runs on the same host), in-memory images as arrays
+        images = [np.asarray(image.convert('RGB')) if isinstance(image, Image.Image) else image for image in images]
+        with connection:
+            connection.send(('predict_batch', images, mask_paths_list))
+            if not connection.poll(self.timeout):
+                raise TimeoutError(f"No response from the inference server after {self.timeout}s.")
+            status, result = connection.recv()
+        if status != 'ok':
+            raise RuntimeError(f"Inference server: {result}")
+        return result
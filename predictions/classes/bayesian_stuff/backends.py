@@ -0,0 +1,81 @@
+""" CPU inference backends for the VGG crowd model.
+
+- 'eager': the float32 nn.Module as is.
+- 'torchscript': scripted, frozen and optimized for inference (constant folding, conv/relu fusion). Any input size.
+- 'int8': statically quantized (post-training, calibrated on real frames) and scripted. It is built offline,
+  `python -m predictions.benchmarks.backends --save-int8 PATH`, and loaded from that file.
+
+With `channels_last`, weights (and inputs, see BayesianPredictor) use the NHWC memory layout, faster for CPU convolutions.
+"""
+import copy
+
+import torch
+import torch.nn as nn
+from torch.ao import quantization
+from torch.nn import functional as F
+
+BACKENDS = ('eager', 'torchscript', 'int8')
+
+
+class QuantizableVGG(nn.Module):
+    """ VGG with quantization stubs. The last convolution (single channel density) stays in float32. """
+
+    def __init__(self, model):
+        super(QuantizableVGG, self).__init__()
+        self.quant = quantization.QuantStub()
+        self.features = model.features
+        self.reg_layer = model.reg_layer[:-1]
+        self.dequant = quantization.DeQuantStub()
+        self.output_layer = model.reg_layer[-1]
+
+    def forward(self, x):
+        x = self.quant(x)
+        x = self.features(x)
+        x = F.interpolate(x, scale_factor=2.0, mode='bilinear', align_corners=True)
+        x = self.reg_layer(x)
+        x = self.dequant(x)
+        x = self.output_layer(x)
+        return torch.abs(x)
+
+    def fuse(self):
+        """ Fuses every Conv2d + ReLU pair (required by quantized convolutions). """
+        for sequential in (self.features, self.reg_layer):
+            layers = list(sequential)
+            pairs = [
+                [str(i), str(i + 1)] for i in range(len(layers) - 1)
+                if isinstance(layers[i], nn.Conv2d) and isinstance(layers[i + 1], nn.ReLU)
+            ]
+            quantization.fuse_modules(sequential, pairs, inplace=True)
+
+
+def to_torchscript(model, channels_last=False):
+    model = copy.deepcopy(model).eval()
+    if channels_last:
+        model = model.to(memory_format=torch.channels_last)
+    scripted = torch.jit.freeze(torch.jit.script(model))
+    return torch.jit.optimize_for_inference(scripted)
+
+
+def quantize(model, calibration_inputs, channels_last=False):
+    """ Returns the scripted int8 model, calibrated with an iterable of (N, 3, H, W) normalized input tensors. """
+    quantizable = QuantizableVGG(copy.deepcopy(model)).eval()
+    quantizable.fuse()
+    quantizable.qconfig = quantization.get_default_qconfig(torch.backends.quantized.engine)
+    quantizable.output_layer.qconfig = None
+    quantization.prepare(quantizable, inplace=True)
+    with torch.no_grad():
+        for inputs in calibration_inputs:
+            quantizable(inputs.contiguous(memory_format=torch.channels_last) if channels_last else inputs)
+    quantization.convert(quantizable, inplace=True)
+    return torch.jit.freeze(torch.jit.script(quantizable))
+
+
+def build(model, backend='eager', channels_last=False, int8_path=None):
+    """ Returns the model to run for `backend`, from the loaded eager float32 `model` (ignored for 'int8'). """
+    if backend == 'eager':
+        return model.to(memory_format=torch.channels_last) if channels_last else model
+    if backend == 'torchscript':
+        return to_torchscript(model, channels_last)
+    if backend == 'int8':
+        return torch.jit.load(int8_path, map_location='cpu')
+    raise ValueError(f"Unknown inference backend {backend!r}, expected one of {BACKENDS}.")
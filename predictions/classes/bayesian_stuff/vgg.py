@@ -3,7 +3,7 @@ import torch.utils.model_zoo as model_zoo
 import torch
 from torch.nn import functional as F
 
-__all__ = ['vgg19']
+__all__ = ['vgg19', 'load_bundle', 'save_bundle']
 model_urls = {
     'vgg19': 'https://download.pytorch.org/models/vgg19-dcbb9e9d.pth',
 }
@@ -22,7 +22,7 @@ class VGG(nn.Module):
 
     def forward(self, x):
         x = self.features(x)
-        x = F.upsample_bilinear(x, scale_factor=2)
+        x = F.interpolate(x, scale_factor=2.0, mode='bilinear', align_corners=True)    # Same as the former F.upsample_bilinear
         x = self.reg_layer(x)
         return torch.abs(x)
 
@@ -46,11 +46,46 @@ cfg = {
     'E': [64, 64, 'M', 128, 128, 'M', 256, 256, 256, 256, 'M', 512, 512, 512, 512, 'M', 512, 512, 512, 512]
 }
 
-def vgg19():
+BUNDLE_FORMAT = 'beachcamweb.vgg/1'
+
+
+def vgg19(pretrained=True):
     """VGG 19-layer model (configuration "E")
-        model pre-trained on ImageNet
+        model pre-trained on ImageNet, unless `pretrained=False` (e.g. when fine-tuned weights are loaded afterwards)
     """
     model = VGG(make_layers(cfg['E']))
-    model.load_state_dict(model_zoo.load_url(model_urls['vgg19']), strict=False)
+    if pretrained:
+        model.load_state_dict(model_zoo.load_url(model_urls['vgg19']), strict=False)
     return model
 
+
+def save_bundle(state_dict, bundle_path, cfg_name='E'):
+    """Saves an offline weight bundle: architecture config and fine-tuned state in a single file."""
+    torch.save({
+        'format': BUNDLE_FORMAT,
+        'cfg': cfg[cfg_name],
+        'state_dict': state_dict,
+    }, bundle_path)
+
+
+def load_bundle(weights_path, device='cpu'):
+    """Builds the model from `weights_path` with a single deserialization and no network access.
+        Accepts both weight bundles (see `save_bundle`) and plain state dicts (e.g. `best_model.pth`).
+    """
+    checkpoint = torch.load(weights_path, map_location=device, weights_only=True)
+    if isinstance(checkpoint, dict) and checkpoint.get('format') == BUNDLE_FORMAT:
+        model = VGG(make_layers(checkpoint['cfg']))
+        state_dict = checkpoint['state_dict']
+    else:
+        model = VGG(make_layers(cfg['E']))
+        state_dict = checkpoint
+    model.load_state_dict(state_dict)
+    return model.to(device)
+
+
+if __name__ == '__main__':
+    # Converts a fine-tuned state dict into a weight bundle:
+    #   python -m predictions.classes.bayesian_stuff.vgg best_model.pth best_model.bundle.pth
+    import sys
+    save_bundle(torch.load(sys.argv[1], map_location='cpu', weights_only=True), sys.argv[2])
+
@@ -1,6 +1,14 @@
 from predictions.DTO.PredictionDTO import PredictionDTO
 
 class PredictorInterface:
+    name = None     # Identifies the predictor's results, e.g. in apps.prediction.models.Prediction
 
-    def predict(self, image_path, mask_paths = []) -> PredictionDTO:
-        pass
\ No newline at end of file
+    def predict(self, image, mask_paths = []) -> PredictionDTO:
+        """ `image` is a file path, a PIL image or an HxWx3 uint8 array.
+            `mask_paths` is a list of masks, or a {region: mask path} dict to also get a count per region. """
+        pass
+
+    def predict_batch(self, images, mask_paths_list = None) -> list[PredictionDTO]:
+        """ Predicts several images at once. Masks are given per image, in the same order as `images`. """
+        mask_paths_list = mask_paths_list or [[] for _ in images]
+        return [self.predict(image, mask_paths) for image, mask_paths in zip(images, mask_paths_list)]